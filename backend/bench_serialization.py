@@ -0,0 +1,182 @@
+"""Serialization micro-benchmark for list-heavy responses.
+
+Times three ways of turning a handler's return value into response bytes,
+on payloads shaped like the real endpoints:
+
+- stdlib: jsonable_encoder + JSONResponse (FastAPI's default before orjson)
+- orjson: jsonable_encoder + ORJSONResponse (our default_response_class)
+- orjson bypass: ORJSONResponse directly, what plain_json() does
+
+No database or server needed:
+
+    python bench_serialization.py
+    python bench_serialization.py --repeat 500 --output benchmarks/serialization.json
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+CATEGORIES = ["Kitchen Renovation", "Bathroom Renovation", "Flooring", "Painting", "Roofing", "Plumbing"]
+LOCATIONS = ["Mississauga", "Toronto", "Brampton"]
+
+
+def timestamp(rng: random.Random) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, 90 * 86400))).isoformat()
+
+
+def new_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def image_variants(rng: random.Random) -> list:
+    """Per-image entries as attach_image_variants() builds them"""
+    entries = []
+    for _ in range(rng.randint(0, 4)):
+        digest = f"{rng.getrandbits(256):064x}"
+        entries.append({
+            "original": f"/api/uploads/{digest}.jpg", "w320": f"/api/uploads/{digest}_w320.webp",
+            "w640": f"/api/uploads/{digest}_w640.webp", "web": f"/api/uploads/{digest}_web.webp"
+        })
+    return entries
+
+
+def job(rng: random.Random, detail: bool = False) -> dict:
+    budget_min = rng.randrange(500, 20000, 100)
+    variants = image_variants(rng)
+    doc = {
+        "id": new_id(rng), "title": f"{rng.choice(CATEGORIES)} project",
+        "description": "Looking for an experienced contractor for this project. " * rng.randint(2, 10),
+        "location": rng.choice(LOCATIONS), "category": rng.choice(CATEGORIES),
+        "budget_min": budget_min, "budget_max": budget_min + 5000, "start_date": None,
+        "images": [entry["original"] for entry in variants], "status": "open",
+        "homeowner_id": new_id(rng), "homeowner_name": "Jane Homeowner", "escrow_amount": None,
+        "awarded_contractor_id": None, "created_at": timestamp(rng), "bid_count": rng.randint(0, 12)
+    }
+    # Lists carry one thumbnail URL per image; the detail view carries every variant
+    if detail:
+        doc["image_variants"] = variants
+    else:
+        doc["thumbnails"] = [entry["w320"] for entry in variants]
+    return doc
+
+
+def message(rng: random.Random) -> dict:
+    return {
+        "id": new_id(rng), "sender_id": new_id(rng), "sender_name": "Sam Contractor",
+        "receiver_id": new_id(rng), "participants_key": f"{new_id(rng)}:{new_id(rng)}", "job_id": None,
+        "content": "Thanks for the details, I can start next week. " * rng.randint(1, 4),
+        "read": rng.random() < 0.8, "created_at": timestamp(rng)
+    }
+
+
+def bid(rng: random.Random) -> dict:
+    return {
+        "id": new_id(rng), "job_id": new_id(rng), "contractor_id": new_id(rng), "contractor_name": "Sam Contractor",
+        "amount": float(rng.randint(1000, 25000)), "message": "I have 10 years of experience. " * 3,
+        "estimated_days": rng.randint(1, 60), "status": "pending", "created_at": timestamp(rng),
+        "job_title": "Kitchen Renovation project", "job_status": "open", "job_location": "Toronto"
+    }
+
+
+def user(rng: random.Random) -> dict:
+    return {
+        "id": new_id(rng), "email": f"user{rng.randint(0, 10**6)}@example.ca", "full_name": "Pat User",
+        "user_type": rng.choice(["homeowner", "contractor"]), "phone": "4165550100", "verified": False,
+        "verification": None, "created_at": timestamp(rng)
+    }
+
+
+def payment(rng: random.Random) -> dict:
+    return {
+        "id": new_id(rng), "session_id": f"cs_live_{rng.getrandbits(128):032x}", "job_id": new_id(rng),
+        "user_id": new_id(rng), "amount": 12500.0, "currency": "cad", "payment_type": "escrow",
+        "payment_status": "paid", "status": "complete", "created_at": timestamp(rng)
+    }
+
+
+def payout(rng: random.Random) -> dict:
+    return {
+        "id": new_id(rng), "job_id": new_id(rng), "contractor_id": new_id(rng), "escrow_amount": 12500.0,
+        "platform_fee": 1250.0, "contractor_payout": 11250.0, "status": "released", "released_at": timestamp(rng)
+    }
+
+
+def payloads(rng: random.Random) -> dict:
+    """Endpoint -> return value at its usual page size"""
+    return {
+        "GET /jobs (100)": [job(rng) for _ in range(100)],
+        "GET /jobs/my-jobs (100)": [job(rng) for _ in range(100)],
+        "GET /jobs/{id}": job(rng, detail=True),
+        "GET /bids/my-bids (100)": [bid(rng) for _ in range(100)],
+        "GET /messages (200)": [message(rng) for _ in range(200)],
+        "GET /messages/{id} (50)": {"messages": [message(rng) for _ in range(50)], "has_more": True, "next_before": None},
+        "GET /admin/users (50)": {"users": [user(rng) for _ in range(50)], "total": 5000},
+        "GET /admin/jobs (50)": {"jobs": [job(rng) for _ in range(50)], "total": 5000},
+        "GET /admin/jobs (1000)": {"jobs": [job(rng) for _ in range(1000)], "total": 5000},
+        "GET /admin/payments (50+50)": {
+            "transactions": [payment(rng) for _ in range(50)], "payouts": [payout(rng) for _ in range(50)]
+        },
+    }
+
+
+STRATEGIES = {
+    "stdlib": lambda content: JSONResponse(jsonable_encoder(content)).body,
+    "orjson": lambda content: ORJSONResponse(jsonable_encoder(content)).body,
+    "orjson bypass": lambda content: ORJSONResponse(content).body,
+}
+
+
+def time_per_call(render, content, repeat: int) -> float:
+    """Best of five batches, in microseconds per call"""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render(content)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+def main(args):
+    results = {}
+    for endpoint, content in payloads(random.Random(args.seed)).items():
+        # Same document either way; only the cost of producing it differs
+        assert json.loads(STRATEGIES["stdlib"](content)) == json.loads(STRATEGIES["orjson bypass"](content))
+        repeat = max(args.repeat // 10, 5) if "1000" in endpoint else args.repeat
+        timings = {name: round(time_per_call(render, content, repeat), 1) for name, render in STRATEGIES.items()}
+        results[endpoint] = {
+            "bytes": len(STRATEGIES["orjson bypass"](content)),
+            "us_per_response": timings,
+            "speedup": round(timings["stdlib"] / timings["orjson bypass"], 1)
+        }
+
+    print(f"{'endpoint':<30} {'bytes':>8} {'stdlib us':>10} {'orjson us':>10} {'bypass us':>10} {'speedup':>8}")
+    for endpoint, result in results.items():
+        timings = result["us_per_response"]
+        print(f"{endpoint:<30} {result['bytes']:>8} {timings['stdlib']:>10} {timings['orjson']:>10} "
+              f"{timings['orjson bypass']:>10} {result['speedup']:>7}x")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare JSON response serialization paths on endpoint-shaped payloads")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per timing batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,491 @@
+"""API benchmark for Build Launch.
+
+Seeds a dedicated MongoDB database with a synthetic marketplace (homeowners,
+contractors, jobs, bids, messages, reviews, payouts), then drives the API and
+reports p50/p95/p99 latency, throughput and Mongo commands per request for
+each endpoint. Results are written as JSON so runs can be compared across commits.
+
+    python benchmark.py                          # seed + run in-process via httpx.ASGITransport
+    python benchmark.py --jobs 20000 --requests 500 --concurrency 20
+    python benchmark.py --skip-seed --baseline benchmarks/<earlier run>.json
+    python benchmark.py --skip-seed --endpoints dashboard   # /dashboard vs the calls it replaces
+
+To benchmark a real worker instead, start uvicorn against the same database with
+the route rate limits opened up as the in-process run does, or /jobs, /conversations
+and friends turn into 429s, and pass --base-url http://127.0.0.1:8001:
+
+    DB_NAME=buildlaunch_benchmark MAX_IN_FLIGHT_REQUESTS=100000 \
+        ROUTE_RATE_LIMITS_JSON="$(python benchmark.py --print-rate-limits)" uvicorn server:app --port 8001
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+# Routes with token buckets; opened up so the benchmark measures handlers, not 429s
+RATE_LIMITED_ROUTES = [
+    "jobs_list", "conversations", "send_message", "upload_image", "escrow_create", "admin_stats", "admin_export"
+]
+BENCH_PASSWORD = "BenchPass123!"
+INSERT_CHUNK = 1000
+
+
+def open_rate_limits_json() -> str:
+    return json.dumps({name: {"user": [1e9, 1e9], "ip": [1e9, 1e9]} for name in RATE_LIMITED_ROUTES})
+
+
+def configure_environment(db_name: str):
+    """Must run before server is imported: it reads its config at import time"""
+    os.environ["DB_NAME"] = db_name
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["ROUTE_RATE_LIMITS_JSON"] = open_rate_limits_json()
+    os.environ["MAX_IN_FLIGHT_REQUESTS"] = "100000"
+    # Never email or text synthetic users; empty values also win over backend/.env
+    for key in ("RESEND_API_KEY", "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN"):
+        os.environ[key] = ""
+
+
+# ============= Seeding =============
+
+def iso_days_ago(rng: random.Random, max_days: int = 90) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, max_days * 86400))).isoformat()
+
+
+def make_user(rng: random.Random, user_type: str, index: int, password_hash: str) -> dict:
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "email": f"bench_{user_type}_{index}@bench.buildlaunch.ca",
+        "password_hash": password_hash,
+        "full_name": f"Bench {user_type.title()} {index}",
+        "user_type": user_type,
+        "phone": f"416555{index:04d}"[-10:],
+        "verified": user_type == "admin" or rng.random() < 0.5,
+        "verification": None,
+        "created_at": iso_days_ago(rng, 365)
+    }
+
+
+async def insert_chunked(collection, docs: list):
+    for start in range(0, len(docs), INSERT_CHUNK):
+        await collection.insert_many(docs[start:start + INSERT_CHUNK], ordered=False)
+
+
+async def seed(server, args, rng: random.Random) -> dict:
+    """Drops the benchmark database and fills it. Returns the number of documents seeded."""
+    db = server.db
+    await server.client.drop_database(db.name)
+    # One bcrypt hash shared by every seeded user; hashing thousands would dominate seeding
+    password_hash = await server.hash_password(BENCH_PASSWORD)
+
+    homeowners = [make_user(rng, "homeowner", i, password_hash) for i in range(args.homeowners)]
+    contractors = [make_user(rng, "contractor", i, password_hash) for i in range(args.contractors)]
+    admin = make_user(rng, "admin", 0, password_hash)
+    await insert_chunked(db.users, homeowners + contractors + [admin])
+
+    jobs, bids, payouts, transactions, reviews = [], [], [], [], []
+    payouts_left, reviews_left = min(args.payouts, args.jobs), args.reviews
+    for _ in range(args.jobs):
+        homeowner = rng.choice(homeowners)
+        budget_min = rng.randrange(500, 20000, 100)
+        job = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": f"{rng.choice(server.JOB_CATEGORIES)} project",
+            "description": "Synthetic benchmark job. " * rng.randint(2, 12),
+            "location": rng.choice(server.LOCATIONS),
+            "category": rng.choice(server.JOB_CATEGORIES),
+            "budget_min": budget_min,
+            "budget_max": budget_min + rng.randrange(500, 10000, 100),
+            "start_date": None,
+            "images": [],
+            "status": "open",
+            "homeowner_id": homeowner["id"],
+            "homeowner_name": homeowner["full_name"],
+            "escrow_amount": None,
+            "awarded_contractor_id": None,
+            "created_at": iso_days_ago(rng)
+        }
+        bidders = rng.sample(contractors, min(rng.randint(0, args.bids_per_job * 2), len(contractors)))
+        for contractor in bidders:
+            bids.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "job_id": job["id"],
+                "contractor_id": contractor["id"],
+                "contractor_name": contractor["full_name"],
+                "amount": float(rng.randint(job["budget_min"], job["budget_max"])),
+                "message": "Synthetic benchmark bid",
+                "estimated_days": rng.randint(1, 60),
+                "status": "pending",
+                "created_at": iso_days_ago(rng)
+            })
+        # Completed jobs carry the escrow, payout and (some) review trail; a slice more are just awarded
+        if bidders and (payouts_left or rng.random() < 0.1):
+            winning_bid = bids[-1]
+            winning_bid["status"] = "accepted"
+            job["awarded_contractor_id"] = winning_bid["contractor_id"]
+            job["escrow_amount"] = winning_bid["amount"]
+            job["status"] = "awarded"
+            transactions.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "session_id": f"cs_bench_{uuid.UUID(int=rng.getrandbits(128)).hex}",
+                "job_id": job["id"],
+                "user_id": homeowner["id"],
+                "amount": winning_bid["amount"],
+                "currency": "cad",
+                "payment_type": "escrow",
+                "payment_status": "paid",
+                "created_at": job["created_at"]
+            })
+            if payouts_left:
+                payouts_left -= 1
+                job["status"] = "completed"
+                platform_fee = winning_bid["amount"] * (server.PLATFORM_FEE_PERCENT / 100)
+                payouts.append({
+                    "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "job_id": job["id"],
+                    "contractor_id": winning_bid["contractor_id"],
+                    "escrow_amount": winning_bid["amount"],
+                    "platform_fee": platform_fee,
+                    "contractor_payout": winning_bid["amount"] - platform_fee,
+                    "status": "released",
+                    "released_at": iso_days_ago(rng)
+                })
+                if reviews_left:
+                    reviews_left -= 1
+                    reviews.append({
+                        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                        "homeowner_id": homeowner["id"],
+                        "homeowner_name": homeowner["full_name"],
+                        "contractor_id": winning_bid["contractor_id"],
+                        "job_id": job["id"],
+                        "rating": rng.randint(3, 5),
+                        "comment": "Synthetic benchmark review",
+                        "created_at": iso_days_ago(rng)
+                    })
+        jobs.append(job)
+
+    # Messages cluster into conversations, like real usage, rather than being spread evenly
+    pairs = [(rng.choice(homeowners), rng.choice(contractors)) for _ in range(max(args.messages // 20, 1))]
+    started = datetime.now(timezone.utc) - timedelta(days=30)
+    messages = []
+    for i in range(args.messages):
+        sender, receiver = rng.choice(pairs)
+        if rng.random() < 0.5:
+            sender, receiver = receiver, sender
+        messages.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "sender_id": sender["id"],
+            "sender_name": sender["full_name"],
+            "receiver_id": receiver["id"],
+            "participants_key": server.conversation_key(sender["id"], receiver["id"]),
+            "job_id": None,
+            "content": "Synthetic benchmark message " * rng.randint(1, 6),
+            "read": rng.random() < 0.8,
+            "created_at": (started + timedelta(seconds=i * 30)).isoformat()
+        })
+
+    for collection, docs in [(db.jobs, jobs), (db.bids, bids), (db.payment_transactions, transactions),
+                             (db.payouts, payouts), (db.reviews, reviews), (db.messages, messages)]:
+        await insert_chunked(collection, docs)
+
+    counts = {
+        "homeowners": len(homeowners), "contractors": len(contractors), "jobs": len(jobs), "bids": len(bids),
+        "messages": len(messages), "reviews": len(reviews), "payouts": len(payouts)
+    }
+    print(f"Seeded {db.name}: " + ", ".join(f"{value} {name}" for name, value in counts.items()))
+    return counts
+
+
+async def load_fixtures(server) -> dict:
+    """Ids and tokens for building requests, read back from the (possibly pre-seeded) database"""
+    db = server.db
+    users = await db.users.find({}, {"_id": 0, "id": 1, "email": 1, "user_type": 1}).to_list(None)
+    if not users:
+        sys.exit(f"Database {db.name} is empty; run without --skip-seed first")
+    by_type = {}
+    for user in users:
+        user["token"] = server.create_token(user["id"], user["email"], user["user_type"])
+        by_type.setdefault(user["user_type"], []).append(user)
+    jobs = await db.jobs.find({}, {"_id": 0, "id": 1, "homeowner_id": 1}).to_list(None)
+    pairs = await db.messages.aggregate([
+        {"$group": {"_id": {"a": "$sender_id", "b": "$receiver_id"}}},
+        {"$limit": 5000}
+    ]).to_list(None)
+    tokens = {user["id"]: user["token"] for user in users}
+    return {
+        "homeowners": by_type.get("homeowner", []),
+        "contractors": by_type.get("contractor", []),
+        "admin": by_type["admin"][0],
+        "jobs": jobs,
+        "conversations": [(pair["_id"]["a"], pair["_id"]["b"]) for pair in pairs],
+        "tokens": tokens
+    }
+
+
+# ============= Endpoints =============
+
+def build_endpoints(fixtures: dict, categories: list, locations: list) -> dict:
+    """name -> function(rng) returning (method, path, token, json body), or a list of
+    them to send concurrently the way a page's Promise.all does (timed as one sample)"""
+    homeowners, contractors, jobs = fixtures["homeowners"], fixtures["contractors"], fixtures["jobs"]
+    conversations, tokens = fixtures["conversations"], fixtures["tokens"]
+    admin_token = fixtures["admin"]["token"]
+
+    def job_bids(rng):
+        job = rng.choice(jobs)
+        return "GET", f"/api/jobs/{job['id']}/bids", tokens[job["homeowner_id"]], None
+
+    def conversation_list(rng):
+        user_id, _ = rng.choice(conversations)
+        return "GET", "/api/messages/conversations", tokens[user_id], None
+
+    def conversation_page(rng):
+        user_id, other_id = rng.choice(conversations)
+        return "GET", f"/api/messages/{other_id}", tokens[user_id], None
+
+    def homeowner_fan_out(rng):
+        token = rng.choice(homeowners)["token"]
+        return [("GET", "/api/jobs/my-jobs", token, None), ("GET", "/api/stats/dashboard", token, None)]
+
+    def contractor_fan_out(rng):
+        token = rng.choice(contractors)["token"]
+        return [("GET", "/api/jobs", token, None), ("GET", "/api/bids/my-bids", token, None),
+                ("GET", "/api/stats/dashboard", token, None)]
+
+    def job_details_fan_out(rng):
+        job = rng.choice(jobs)
+        token = tokens[job["homeowner_id"]]
+        return [("GET", f"/api/jobs/{job['id']}", token, None), ("GET", f"/api/jobs/{job['id']}/bids", token, None)]
+
+    def job_details_batch(rng):
+        job = rng.choice(jobs)
+        return "POST", "/api/batch", tokens[job["homeowner_id"]], {"requests": [
+            {"id": "job", "path": f"/api/jobs/{job['id']}"}, {"id": "bids", "path": f"/api/jobs/{job['id']}/bids"}
+        ]}
+
+    def send_message(rng):
+        user_id, other_id = rng.choice(conversations)
+        return "POST", "/api/messages", tokens[user_id], {"receiver_id": other_id, "content": "Benchmark message"}
+
+    endpoints = {
+        "GET /categories": lambda rng: ("GET", "/api/categories", None, None),
+        "GET /jobs": lambda rng: ("GET", "/api/jobs", None, None),
+        "GET /jobs?category&location": lambda rng: (
+            "GET", f"/api/jobs?category={rng.choice(categories)}&location={rng.choice(locations)}", None, None
+        ),
+        "GET /jobs/{id}": lambda rng: ("GET", f"/api/jobs/{rng.choice(jobs)['id']}", None, None),
+        "GET /jobs/{id}/bids": job_bids,
+        "GET /jobs/my-jobs": lambda rng: ("GET", "/api/jobs/my-jobs", rng.choice(homeowners)["token"], None),
+        "GET /bids/my-bids": lambda rng: ("GET", "/api/bids/my-bids", rng.choice(contractors)["token"], None),
+        "GET /stats/dashboard (homeowner)": lambda rng: ("GET", "/api/stats/dashboard", rng.choice(homeowners)["token"], None),
+        "GET /stats/dashboard (contractor)": lambda rng: ("GET", "/api/stats/dashboard", rng.choice(contractors)["token"], None),
+        "dashboard fan-out (homeowner)": homeowner_fan_out,
+        "GET /dashboard (homeowner)": lambda rng: ("GET", "/api/dashboard", rng.choice(homeowners)["token"], None),
+        "dashboard fan-out (contractor)": contractor_fan_out,
+        "GET /dashboard (contractor)": lambda rng: ("GET", "/api/dashboard", rng.choice(contractors)["token"], None),
+        "job details fan-out": job_details_fan_out,
+        "POST /batch (job details)": job_details_batch,
+        "GET /contractors/{id}": lambda rng: ("GET", f"/api/contractors/{rng.choice(contractors)['id']}", None, None),
+        "GET /reviews/contractor/{id}": lambda rng: ("GET", f"/api/reviews/contractor/{rng.choice(contractors)['id']}", None, None),
+        "GET /messages/unread-count": lambda rng: ("GET", "/api/messages/unread-count", rng.choice(homeowners)["token"], None),
+        "GET /admin/stats": lambda rng: ("GET", "/api/admin/stats", admin_token, None),
+        "POST /auth/login": lambda rng: (
+            "POST", "/api/auth/login", None, {"email": rng.choice(homeowners + contractors)["email"], "password": BENCH_PASSWORD}
+        ),
+    }
+    if conversations:
+        endpoints["GET /messages/conversations"] = conversation_list
+        endpoints["GET /messages/{other_user_id}"] = conversation_page
+        endpoints["POST /messages"] = send_message
+    return endpoints
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def run_endpoint(client, build, total: int, concurrency: int, warmup: int, rng: random.Random) -> dict:
+    latencies, statuses, db_queries = [], Counter(), []
+
+    def request(method, path, token, body):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return client.request(method, path, headers=headers, json=body)
+
+    async def send(record: bool):
+        built = build(rng)
+        fan_out = built if isinstance(built, list) else [built]
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(request(*call) for call in fan_out))
+        elapsed = time.perf_counter() - started
+        if record:
+            latencies.append(elapsed)
+            statuses[max(response.status_code for response in responses)] += 1
+            counted = [int(r.headers["x-db-query-count"]) for r in responses if "x-db-query-count" in r.headers]
+            if counted:
+                db_queries.append(sum(counted))
+
+    for _ in range(warmup):
+        await send(record=False)
+
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            await send(record=True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0,
+        "db_queries_mean": round(sum(db_queries) / len(db_queries), 1) if db_queries else None
+    }
+
+
+# ============= Reporting =============
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'endpoint':<36} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6} {'db q':>6}"
+    if baseline:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results["endpoints"].items():
+        line = (
+            f"{name:<36} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+            f"{stats['p99_ms']:>8} {stats['error_rate'] * 100:>6.1f} {stats['db_queries_mean'] or '-':>6}"
+        )
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f" {(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:>+11.1f}%"
+        print(line)
+
+
+async def main(args):
+    configure_environment(args.db_name)
+    sys.path.insert(0, str(ROOT_DIR))
+    import server
+    import httpx
+
+    rng = random.Random(args.seed)
+    seeded = None
+    if not args.skip_seed:
+        seeded = await seed(server, args, rng)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        # ASGITransport skips lifespan, so run startup (indexes, counters, background tasks) ourselves
+        await server.app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark", timeout=60)
+
+    fixtures = await load_fixtures(server)
+    endpoints = build_endpoints(fixtures, server.JOB_CATEGORIES, server.LOCATIONS)
+    if args.endpoints:
+        endpoints = {name: build for name, build in endpoints.items() if any(part in name for part in args.endpoints)}
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.base_url or "in-process",
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+            "seed": args.seed, "db_name": args.db_name
+        },
+        "seeded": seeded,
+        "endpoints": {}
+    }
+    try:
+        async with client:
+            for name, build in endpoints.items():
+                # Login is bcrypt-bound by design; a tenth of the volume is enough to see it
+                total = max(args.requests // 10, 10) if name == "POST /auth/login" else args.requests
+                results["endpoints"][name] = await run_endpoint(client, build, total, args.concurrency, args.warmup, rng)
+                print(f"  {name}: p95 {results['endpoints'][name]['p95_ms']} ms")
+    finally:
+        if not args.base_url:
+            await server.app.router.shutdown()
+
+    throttled = [name for name, stats in results["endpoints"].items() if "429" in stats["statuses"]]
+    if throttled:
+        print(f"\nWARNING: 429s from {', '.join(throttled)}; the target is applying its rate limits, so these "
+              f"numbers measure the limiter. Start it with ROUTE_RATE_LIMITS_JSON=\"$(python benchmark.py --print-rate-limits)\".")
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print()
+    print_report(results, baseline)
+
+    output = Path(args.output) if args.output else (
+        ROOT_DIR / "benchmarks" / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic marketplace and benchmark the Build Launch API")
+    seeding = parser.add_argument_group("seeding")
+    seeding.add_argument("--db-name", default="buildlaunch_benchmark", help="database to drop and seed (never your dev DB)")
+    seeding.add_argument("--skip-seed", action="store_true", help="reuse the data from a previous run")
+    seeding.add_argument("--homeowners", type=int, default=500)
+    seeding.add_argument("--contractors", type=int, default=200)
+    seeding.add_argument("--jobs", type=int, default=5000)
+    seeding.add_argument("--bids-per-job", type=int, default=4, help="average; actual is uniform in [0, 2x]")
+    seeding.add_argument("--messages", type=int, default=20000)
+    seeding.add_argument("--payouts", type=int, default=1000, help="completed jobs with escrow and payout")
+    seeding.add_argument("--reviews", type=int, default=800, help="reviews on completed jobs")
+    seeding.add_argument("--seed", type=int, default=42, help="random seed, so runs see the same data")
+    load = parser.add_argument_group("load")
+    load.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    load.add_argument("--requests", type=int, default=300, help="measured requests per endpoint")
+    load.add_argument("--concurrency", type=int, default=10)
+    load.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    load.add_argument("--endpoints", nargs="*", help="only run endpoints whose name contains one of these")
+    parser.add_argument("--output", help="results file (default benchmarks/<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare p95 against")
+    parser.add_argument("--print-rate-limits", action="store_true",
+                        help="print the ROUTE_RATE_LIMITS_JSON that opens the buckets for a --base-url target, and exit")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.print_rate_limits:
+        print(open_rate_limits_json())
+    else:
+        asyncio.run(main(args))
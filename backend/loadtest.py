@@ -0,0 +1,388 @@
+"""Scenario load test for Build Launch.
+
+Virtual homeowners and contractors run realistic sessions against one uvicorn
+worker. Homeowners post a job, fund escrow through a fake Stripe, wait for bids,
+accept one, message the contractor, release payment and leave a review.
+Contractors browse, bid and message. Each stage holds a fixed number of
+concurrent users for --duration seconds. The report gives per-step latency,
+error rates and Mongo commands (from X-DB-Query-Count) per stage, so the stage
+where throughput stops growing is the worker's saturation point.
+
+    python loadtest.py --concurrency 10 25 50 100 --duration 30
+
+By default this starts its own single-worker uvicorn (create_app below, with
+FakeStripeCheckout installed) against a dedicated database. To target a server
+you started yourself, run it the same way so escrow can be funded:
+
+    DB_NAME=buildlaunch_loadtest uvicorn loadtest:create_app --factory --port 8002
+    python loadtest.py --base-url http://127.0.0.1:8002
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmark import ROOT_DIR, configure_environment, git_commit, percentile
+
+LOADTEST_PASSWORD = "LoadTest123!"
+BID_WAIT_SECONDS = 10  # how long a homeowner waits for a first bid before giving up on the job
+BID_POLL_INTERVAL = 1.0
+
+
+def create_app():
+    """uvicorn --factory entry point: the real app with Stripe replaced by the local fake"""
+    sys.path.insert(0, str(ROOT_DIR / "tests"))
+    import server
+    from fake_stripe import FakeStripeCheckout
+
+    FakeStripeCheckout.latency = float(os.environ.get("FAKE_STRIPE_LATENCY_MS", "150")) / 1000
+    server.stripe_checkout_factory = FakeStripeCheckout
+    return server.app
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Per-step latencies, statuses and DB command counts for one stage"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.db_queries = {}
+        self.sessions = Counter()
+
+    def record(self, step: str, elapsed: float, response):
+        self.latencies.setdefault(step, []).append(elapsed)
+        self.statuses.setdefault(step, Counter())[response.status_code if response is not None else "error"] += 1
+        if response is not None and "x-db-query-count" in response.headers:
+            self.db_queries.setdefault(step, []).append(int(response.headers["x-db-query-count"]))
+
+    def summary(self, wall: float) -> dict:
+        steps = {}
+        for step, latencies in self.latencies.items():
+            latencies.sort()
+            statuses = self.statuses[step]
+            errors = sum(count for status, count in statuses.items() if status == "error" or status >= 400)
+            queries = self.db_queries.get(step, [])
+            steps[step] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4),
+                "statuses": {str(status): count for status, count in statuses.items()},
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "db_queries_mean": round(sum(queries) / len(queries), 1) if queries else None,
+                "db_queries_total": sum(queries)
+            }
+        every = sorted(latency for latencies in self.latencies.values() for latency in latencies)
+        total = len(every)
+        errors = sum(step["errors"] for step in steps.values())
+        return {
+            "requests": total,
+            "throughput_rps": round(total / wall, 1) if wall else 0,
+            "error_rate": round(errors / total, 4) if total else 0,
+            "p50_ms": round(percentile(every, 50) * 1000, 2),
+            "p95_ms": round(percentile(every, 95) * 1000, 2),
+            "p99_ms": round(percentile(every, 99) * 1000, 2),
+            "db_queries_total": sum(step["db_queries_total"] for step in steps.values()),
+            "sessions": dict(self.sessions),
+            "steps": steps
+        }
+
+
+class VirtualUser:
+    def __init__(self, client, recorder: Recorder, rng: random.Random, user_type: str):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.user_type = user_type
+        self.token = None
+        self.user = None
+
+    async def call(self, step: str, method: str, path: str, expect=(200,), **kwargs):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+        finally:
+            self.recorder.record(step, time.perf_counter() - started, response)
+        if response.status_code not in expect:
+            raise StepFailed(f"{step}: {response.status_code} {response.text[:200]}")
+        return response.json() if response.content else None
+
+    async def sign_up(self):
+        email = f"load_{self.user_type}_{uuid.uuid4().hex[:12]}@loadtest.buildlaunch.ca"
+        data = await self.call("register", "POST", "/api/auth/register", json={
+            "email": email,
+            "password": LOADTEST_PASSWORD,
+            "full_name": f"Load {self.user_type.title()}",
+            "user_type": self.user_type
+        })
+        self.token, self.user = data["token"], data["user"]
+
+
+async def homeowner_session(user: VirtualUser, categories: list, locations: list):
+    await user.call("categories", "GET", "/api/categories")
+    await user.call("locations", "GET", "/api/locations")
+    budget_min = user.rng.randrange(1000, 20000, 500)
+    job = await user.call("post job", "POST", "/api/jobs", json={
+        "title": "Load test renovation",
+        "description": "Synthetic job created by the load test runner.",
+        "location": user.rng.choice(locations),
+        "category": user.rng.choice(categories),
+        "budget_min": budget_min,
+        "budget_max": budget_min + 5000
+    })
+    job_id = job["id"]
+    await user.call("my jobs", "GET", "/api/jobs/my-jobs")
+
+    checkout = await user.call("escrow create", "POST", "/api/payments/escrow/create", json={
+        "job_id": job_id,
+        "origin_url": "http://loadtest.local"
+    })
+    status = await user.call("escrow status", "GET", f"/api/payments/status/{checkout['session_id']}")
+    if status["status"] != "paid":
+        raise StepFailed(f"escrow status: {status['status']}")
+
+    deadline = time.monotonic() + BID_WAIT_SECONDS
+    bids = []
+    while time.monotonic() < deadline:
+        bids = await user.call("review bids", "GET", f"/api/jobs/{job_id}/bids")
+        if bids:
+            break
+        await asyncio.sleep(BID_POLL_INTERVAL)
+    if not bids:
+        return "no bids"
+
+    bid = min(bids, key=lambda bid: bid["amount"])
+    await user.call("accept bid", "PUT", f"/api/bids/{bid['id']}/accept")
+    await user.call("send message", "POST", "/api/messages", json={
+        "receiver_id": bid["contractor_id"],
+        "job_id": job_id,
+        "content": "Thanks, looking forward to working with you."
+    })
+    await user.call("release payment", "POST", "/api/payments/release", json={"job_id": job_id})
+    await user.call("leave review", "POST", "/api/reviews", json={
+        "contractor_id": bid["contractor_id"],
+        "job_id": job_id,
+        "rating": user.rng.randint(3, 5),
+        "comment": "Load test review"
+    })
+    await user.call("dashboard", "GET", "/api/stats/dashboard")
+    return "completed"
+
+
+async def contractor_session(user: VirtualUser, categories: list, locations: list):
+    jobs = await user.call("browse jobs", "GET", "/api/jobs")
+    await user.call("browse filtered", "GET", "/api/jobs", params={
+        "category": user.rng.choice(categories),
+        "location": user.rng.choice(locations)
+    })
+    # Newest jobs first, which is where the homeowners' fresh postings are
+    candidates = [job for job in jobs[:20] if job["homeowner_id"] != user.user["id"]]
+    if not candidates:
+        return "nothing to bid on"
+    for job in user.rng.sample(candidates, min(3, len(candidates))):
+        await user.call("view job", "GET", f"/api/jobs/{job['id']}")
+    job = user.rng.choice(candidates)
+    # 400 is a normal outcome: the job was awarded meanwhile or we already bid on it
+    await user.call("place bid", "POST", f"/api/jobs/{job['id']}/bids", expect=(200, 400), json={
+        "amount": float(user.rng.randint(int(job["budget_min"]), int(job["budget_max"]))),
+        "message": "Load test bid",
+        "estimated_days": user.rng.randint(3, 30)
+    })
+    await user.call("my bids", "GET", "/api/bids/my-bids")
+    await user.call("send message", "POST", "/api/messages", json={
+        "receiver_id": job["homeowner_id"],
+        "job_id": job["id"],
+        "content": "Happy to answer any questions about my bid."
+    })
+    await user.call("conversations", "GET", "/api/messages/conversations")
+    await user.call("unread count", "GET", "/api/messages/unread-count")
+    await user.call("dashboard", "GET", "/api/stats/dashboard")
+    return "completed"
+
+
+async def run_user(client, recorder: Recorder, rng: random.Random, user_type: str, stop_at: float,
+                   categories: list, locations: list):
+    """Signs up once, then repeats sessions until the stage ends"""
+    user = VirtualUser(client, recorder, rng, user_type)
+    session = homeowner_session if user_type == "homeowner" else contractor_session
+    while time.monotonic() < stop_at:
+        try:
+            if user.token is None:
+                await user.sign_up()
+            outcome = await session(user, categories, locations)
+        except StepFailed as e:
+            outcome = "failed"
+            if recorder.sessions[f"{user_type} failed"] < 3:
+                print(f"    {user_type} session failed: {e}")
+        except Exception as e:
+            outcome = "failed"
+            print(f"    {user_type} session error: {type(e).__name__}: {e}")
+            await asyncio.sleep(0.5)
+        recorder.sessions[f"{user_type} {outcome}"] += 1
+
+
+async def run_stage(base_url: str, concurrency: int, args, rng: random.Random, categories: list, locations: list) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    homeowners = max(1, round(concurrency * args.homeowner_share))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(
+            run_user(client, recorder, random.Random(rng.random()), "homeowner" if i < homeowners else "contractor",
+                     stop_at, categories, locations)
+            for i in range(concurrency)
+        ))
+        wall = time.monotonic() - started
+    stage = {"concurrency": concurrency, "homeowners": homeowners, "contractors": concurrency - homeowners,
+             "duration_s": round(wall, 1), **recorder.summary(wall)}
+    return stage
+
+
+# ============= Server =============
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def reset_database(db_name: str):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(ROOT_DIR / ".env")
+    with MongoClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017")) as mongo:
+        mongo.drop_database(db_name)
+
+
+def start_server(port: int, stripe_latency_ms: float) -> subprocess.Popen:
+    env = dict(os.environ, FAKE_STRIPE_LATENCY_MS=str(stripe_latency_ms))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "loadtest:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30):
+    """Polls until the API answers; returns its categories and locations for the scenarios"""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/api/categories")
+                if response.status_code == 200:
+                    locations = (await client.get("/api/locations")).json()["locations"]
+                    return response.json()["categories"], locations
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.3)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+# ============= Reporting =============
+
+def print_stage(stage: dict):
+    print(f"\n== {stage['concurrency']} users ({stage['homeowners']} homeowners): "
+          f"{stage['throughput_rps']} req/s, p95 {stage['p95_ms']} ms, "
+          f"errors {stage['error_rate'] * 100:.1f}%, sessions {stage['sessions']}")
+    header = f"  {'step':<18} {'reqs':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6} {'db q':>6}"
+    print(header)
+    for name, step in sorted(stage["steps"].items(), key=lambda item: -item[1]["p95_ms"]):
+        print(f"  {name:<18} {step['requests']:>7} {step['p50_ms']:>8} {step['p95_ms']:>8} {step['p99_ms']:>8} "
+              f"{step['error_rate'] * 100:>6.1f} {step['db_queries_mean'] or '-':>6}")
+
+
+def saturation_point(stages: list):
+    """First stage whose extra users bought less than 10% more throughput"""
+    for previous, stage in zip(stages, stages[1:]):
+        if stage["throughput_rps"] < previous["throughput_rps"] * 1.1:
+            return previous["concurrency"]
+    return None
+
+
+async def main(args):
+    configure_environment(args.db_name)
+    rng = random.Random(args.seed)
+
+    server_process = None
+    base_url = args.base_url
+    if not base_url:
+        reset_database(args.db_name)
+        port = free_port()
+        server_process = start_server(port, args.stripe_latency_ms)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        categories, locations = await wait_until_ready(base_url)
+        stages = []
+        for concurrency in args.concurrency:
+            print(f"Running {concurrency} concurrent users for {args.duration}s...")
+            stage = await run_stage(base_url, concurrency, args, rng, categories, locations)
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.wait(timeout=10)
+
+    saturated_at = saturation_point(stages)
+    if saturated_at:
+        print(f"\nThroughput stopped scaling after {saturated_at} concurrent users")
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.base_url or "uvicorn (1 worker, fake Stripe)",
+        "config": {
+            "duration_s": args.duration, "homeowner_share": args.homeowner_share,
+            "stripe_latency_ms": args.stripe_latency_ms, "seed": args.seed, "db_name": args.db_name
+        },
+        "saturated_at": saturated_at,
+        "stages": stages
+    }
+    output = Path(args.output) if args.output else (
+        ROOT_DIR / "benchmarks" / f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run homeowner/contractor scenarios against one Build Launch worker")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 25, 50],
+                        help="concurrent virtual users per stage; several values ramp up")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per stage")
+    parser.add_argument("--homeowner-share", type=float, default=0.3, help="fraction of users that are homeowners")
+    parser.add_argument("--stripe-latency-ms", type=float, default=150, help="simulated Stripe round trip")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--base-url", help="target an already running server instead of starting one")
+    parser.add_argument("--db-name", default="buildlaunch_loadtest", help="database to reset and use")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default benchmarks/loadtest-<time>-<commit>.json)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
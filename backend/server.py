@@ -1,31 +1,58 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header, UploadFile, File, Cookie, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, ORJSONResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response as StarletteResponse
+from starlette.routing import Match
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 import re
+import json
+import math
+import time
 import hashlib
+import contextvars
+import threading
+import multiprocessing
+import sys
+import traceback
+from bisect import bisect_left
 import secrets
 import httpx
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, validator
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set
 import uuid
+from urllib.parse import urlsplit
 from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import jwt
 import bcrypt
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 import resend
 from twilio.rest import Client as TwilioClient
+from twilio.base.exceptions import TwilioRestException
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from PIL import Image, ImageOps
 import io
+import csv
+import stat
+import zlib
+import orjson
+try:
+    import brotli  # optional: adds Content-Encoding: br when installed
+except ImportError:
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 UPLOAD_DIR = ROOT_DIR / "uploads"
@@ -35,9 +62,45 @@ INVOICE_DIR.mkdir(exist_ok=True)
 
 load_dotenv(ROOT_DIR / '.env')
 
+# MongoDB query accounting: every command is charged to the request that issued it
+DB_QUERY_BUDGET = int(os.environ.get('DB_QUERY_BUDGET', '20'))  # queries per request before we warn
+
+class RequestDbStats:
+    __slots__ = ("commands",)
+    
+    def __init__(self):
+        self.commands = []  # (command name, duration in microseconds); list.append is thread-safe
+    
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+    
+    @property
+    def total_ms(self) -> float:
+        return sum(micros for _, micros in self.commands) / 1000
+
+request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar("request_db_stats", default=None)
+
+class QueryCounter(monitoring.CommandListener):
+    """Attributes Mongo commands to the current request. Motor runs pymongo on
+    executor threads with a copy of the caller's context, so the contextvar
+    still points at the request's stats object."""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        db_command_seconds.observe(event.duration_micros / 1e6, event.command_name)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.commands.append((event.command_name, event.duration_micros))
+    
+    def failed(self, event):
+        self.succeeded(event)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[QueryCounter()])
 db = client[os.environ['DB_NAME']]
 
 # JWT Config
@@ -48,6 +111,27 @@ JWT_EXPIRATION_HOURS = 24
 # Stripe Config
 STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
 PLATFORM_FEE_PERCENT = 10
+CHECKOUT_SESSION_TTL = timedelta(hours=24)  # Stripe's default Checkout Session lifetime
+CHECKOUT_REUSE_MARGIN = timedelta(minutes=30)  # don't hand out a session the user can't finish in time
+RECONCILE_AFTER_MINUTES = int(os.environ.get('RECONCILE_AFTER_MINUTES', '30'))  # pending this long gets checked with Stripe
+RECONCILE_INTERVAL = 10 * 60  # seconds between reconciler runs
+RECONCILE_BATCH_SIZE = 200  # transactions checked per run
+RECONCILE_CONCURRENCY = 5  # Stripe status calls in flight at once
+RECONCILE_LEASE_SECONDS = 2 * RECONCILE_INTERVAL  # one worker reconciles; another takes over if it stops renewing
+
+# Messaging Config
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 100
+
+# CPU Worker Config (invoice PDFs, image variants)
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', '2'))
+
+# Upload Config
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '15')) * 1024 * 1024
+ALLOWED_IMAGE_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+THUMBNAIL_WIDTHS = [320, 640]
+WEB_VARIANT_MAX_WIDTH = 1600
+UPLOAD_NAME_RE = re.compile(r"/api/uploads/([0-9a-f]{64})\.\w+$")
 
 # Admin Config
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@buildlaunch.ca')
@@ -57,22 +141,71 @@ ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'BuildLaunch2024!')
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
 if RESEND_API_KEY:
     resend.api_key = RESEND_API_KEY
+EMAIL_FROM = "Build Launch <notifications@buildlaunch.ca>"
+DIGEST_WINDOW_MINUTES = int(os.environ.get('DIGEST_WINDOW_MINUTES', '60'))
+DIGEST_FLUSH_INTERVAL = 60  # seconds between digest sweeps
+DIGEST_CLAIM_SECONDS = 300  # a worker's claim on due events lapses after this, e.g. if it crashed mid-send
+RESEND_BATCH_LIMIT = 100  # max emails per Resend batch call
 
 # Twilio SMS Config
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
+TWILIO_API_BASE_URL = os.environ.get('TWILIO_API_BASE_URL')  # point at a local fake in tests
+SMS_RATE_PER_SECOND = float(os.environ.get('SMS_RATE_PER_SECOND', '1'))  # Twilio long-code throughput
+SMS_BATCH_SIZE = 10
+SMS_MAX_RETRIES = 3
 twilio_client = None
 if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
     twilio_client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    if TWILIO_API_BASE_URL:
+        twilio_client.api.base_url = TWILIO_API_BASE_URL
 
-# Rate Limiting (in-memory for simplicity)
-login_attempts = defaultdict(list)
-MAX_LOGIN_ATTEMPTS = 5
+# Rate Limiting
+MAX_LOGIN_ATTEMPTS = 5  # failed attempts per email per window
+MAX_IP_LOGIN_ATTEMPTS = 20  # failed attempts per client IP per window
 LOCKOUT_DURATION = 300  # 5 minutes
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))  # per limiter, in-memory backend
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory' (per worker) or 'mongo' (shared)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))  # proxies in front of us that append X-Forwarded-For (the ingress); 0 uses the socket peer
+# Token buckets per route: {"user"|"ip": [refill tokens per second, burst size]}
+ROUTE_RATE_LIMITS = {
+    "jobs_list": {"ip": [5, 30]},
+    "conversations": {"user": [1, 10], "ip": [5, 30]},
+    "send_message": {"user": [1, 10]},
+    "upload_image": {"user": [0.5, 10]},
+    "escrow_create": {"user": [0.2, 3]},
+    "admin_stats": {"user": [0.5, 5]},
+    "admin_export": {"user": [0.1, 3]},
+}
+ROUTE_RATE_LIMITS.update(json.loads(os.environ.get('ROUTE_RATE_LIMITS_JSON', '{}')))
+MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('MAX_IN_FLIGHT_REQUESTS', '200'))  # per worker, then shed with 503
+
+# Metrics Config
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # if set, /metrics requires "Authorization: Bearer <token>"
+LOOP_LAG_SAMPLE_INTERVAL = 0.05  # seconds between event loop heartbeats
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100'))  # log the blocking stack above this
+LOOP_BLOCK_STRICT_MS = float(os.environ.get('LOOP_BLOCK_STRICT_MS', '0'))  # debug/test mode: fail requests that block longer
+
+# Compression Config
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))  # smaller bodies go out as-is
+COMPRESSION_OFFLOAD_BYTES = 256 * 1024  # compress bodies larger than this on a thread, off the event loop
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # per-request; cached payloads are compressed once at CACHED_COMPRESSION_LEVEL
+CACHED_COMPRESSION_LEVEL = 9
+JOB_LIST_CACHE_TTL = float(os.environ.get('JOB_LIST_CACHE_TTL', '10'))  # seconds; bounds staleness across workers
+JOB_LIST_CACHE_MAX_ENTRIES = 256
+
+# POST /api/batch: read-only sub-requests combined into one round trip
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '10'))
+
+# Idempotency-Key on create endpoints: the first response is stored and replayed to retries
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+IDEMPOTENCY_WAIT_SECONDS = 10  # a duplicate waits this long for the original to finish, then gets a 409
+IDEMPOTENCY_LOCK_SECONDS = 60  # a claim still unfinished after this is from a worker that died
 
 # Create the main app
-app = FastAPI(title="Build Launch API")
+app = FastAPI(title="Build Launch API", default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -80,6 +213,11 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def plain_json(content) -> ORJSONResponse:
+    """For content that is already JSON-native (Mongo documents read with _id excluded).
+    Returning a Response skips FastAPI's jsonable_encoder walk over every item."""
+    return ORJSONResponse(content)
+
 # ============= Models =============
 
 def validate_password_strength(password: str) -> bool:
@@ -214,13 +352,955 @@ class EscrowPaymentRequest(BaseModel):
 class PaymentReleaseRequest(BaseModel):
     job_id: str
 
+class NotificationPreferences(BaseModel):
+    email_frequency: str  # 'immediate' or 'digest'
+    
+    @validator('email_frequency')
+    def valid_frequency(cls, v):
+        if v not in ['immediate', 'digest']:
+            raise ValueError('Email frequency must be immediate or digest')
+        return v
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back so clients can pick out responses; defaults to the index
+    path: str  # e.g. /api/jobs/{job_id}/bids?view=full
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+    
+    @validator('requests')
+    def within_limit(cls, v):
+        if not v:
+            raise ValueError('At least one request is required')
+        if len(v) > BATCH_MAX_REQUESTS:
+            raise ValueError(f'At most {BATCH_MAX_REQUESTS} requests per batch')
+        return v
+
+# ============= Rate Limiting =============
+
+class MemoryRateLimiter:
+    """Sliding-window counter per key with a hard cap on the number of keys.
+    
+    Each key keeps only (window index, current count, previous count), and the
+    estimate weights the previous window by how much of it still overlaps the
+    sliding window. Keys live in an LRU: stale keys are dropped as new ones
+    arrive, and the least recently used key is evicted at max_keys, so bursts
+    of random keys cannot grow the heap.
+    """
+    
+    def __init__(self, limit: int, window: int, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.entries: OrderedDict = OrderedDict()  # key -> [window index, current, previous]
+    
+    def _estimate(self, key: str, now: float) -> float:
+        entry = self.entries.get(key)
+        if not entry:
+            return 0
+        index = int(now // self.window)
+        if entry[0] == index:
+            current, previous = entry[1], entry[2]
+        elif entry[0] == index - 1:
+            current, previous = 0, entry[1]
+        else:
+            return 0
+        overlap = 1 - (now % self.window) / self.window
+        return current + previous * overlap
+    
+    async def is_limited(self, key: str) -> bool:
+        return self._estimate(key, datetime.now(timezone.utc).timestamp()) >= self.limit
+    
+    async def record(self, key: str):
+        now = datetime.now(timezone.utc).timestamp()
+        index = int(now // self.window)
+        entry = self.entries.get(key)
+        if entry is None:
+            self._make_room(index)
+            self.entries[key] = [index, 1, 0]
+            return
+        self.entries.move_to_end(key)
+        if entry[0] == index:
+            entry[1] += 1
+        else:
+            previous = entry[1] if entry[0] == index - 1 else 0
+            entry[:] = [index, 1, previous]
+    
+    async def reset(self, key: str):
+        self.entries.pop(key, None)
+    
+    def _make_room(self, index: int):
+        # Oldest entries first: drop any that can no longer affect a decision
+        while self.entries:
+            oldest = next(iter(self.entries.values()))
+            if oldest[0] >= index - 1 and len(self.entries) < self.max_keys:
+                break
+            self.entries.popitem(last=False)
+
+class MongoRateLimiter:
+    """Same sliding-window estimate, stored in MongoDB so every worker shares one count.
+    
+    One small document per key per window; a TTL index removes them once they
+    no longer overlap the sliding window.
+    """
+    
+    def __init__(self, name: str, limit: int, window: int):
+        self.name = name
+        self.limit = limit
+        self.window = window
+    
+    async def is_limited(self, key: str) -> bool:
+        now = datetime.now(timezone.utc).timestamp()
+        index = int(now // self.window)
+        counts = {
+            doc["window"]: doc["count"]
+            async for doc in db.rate_limits.find(
+                {"key": f"{self.name}:{key}", "window": {"$in": [index, index - 1]}},
+                {"_id": 0, "window": 1, "count": 1}
+            )
+        }
+        overlap = 1 - (now % self.window) / self.window
+        return counts.get(index, 0) + counts.get(index - 1, 0) * overlap >= self.limit
+    
+    async def record(self, key: str):
+        index = int(datetime.now(timezone.utc).timestamp() // self.window)
+        await db.rate_limits.update_one(
+            {"key": f"{self.name}:{key}", "window": index},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"expires_at": datetime.fromtimestamp((index + 2) * self.window, timezone.utc)}
+            },
+            upsert=True
+        )
+    
+    async def reset(self, key: str):
+        await db.rate_limits.delete_many({"key": f"{self.name}:{key}"})
+
+def make_rate_limiter(name: str, limit: int, window: int):
+    if RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimiter(name, limit, window)
+    return MemoryRateLimiter(limit, window)
+
+login_limiter = make_rate_limiter("login_email", MAX_LOGIN_ATTEMPTS, LOCKOUT_DURATION)
+ip_login_limiter = make_rate_limiter("login_ip", MAX_IP_LOGIN_ATTEMPTS, LOCKOUT_DURATION)
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by user or IP, bounded by the same LRU scheme as MemoryRateLimiter"""
+    
+    def __init__(self, rate: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: OrderedDict = OrderedDict()  # key -> [tokens, last refill time]
+    
+    def acquire(self, key: str) -> float:
+        """Take a token. Returns 0 when allowed, otherwise seconds until one is available."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[key] = [float(self.burst), now]
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+route_limiters = {
+    (name, scope): TokenBucketLimiter(rate, burst)
+    for name, scopes in ROUTE_RATE_LIMITS.items()
+    for scope, (rate, burst) in scopes.items()
+}
+
+def token_user_id(request: Request) -> Optional[str]:
+    """User id from the bearer token without a database lookup, for keying limits"""
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.decode(auth[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("user_id")
+    except jwt.InvalidTokenError:
+        return None
+
+def route_rate_limit(name: str):
+    """Route dependency applying the ROUTE_RATE_LIMITS buckets configured under name"""
+    async def enforce(request: Request):
+        keys = {"ip": client_ip(request)}
+        user_id = token_user_id(request)
+        # Anonymous callers fall back to their IP for per-user buckets
+        keys["user"] = f"user:{user_id}" if user_id else f"ip:{keys['ip']}"
+        for scope in ROUTE_RATE_LIMITS.get(name, {}):
+            wait = route_limiters[(name, scope)].acquire(keys[scope])
+            if wait:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests. Please slow down.",
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+    return Depends(enforce)
+
+# ============= Metrics =============
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+metrics_registry = []
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter per label set. Updates are a dict lookup and an add under a lock."""
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+        metrics_registry.append(self)
+    
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+    
+    def render(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.labels, key)} {value}" for key, value in list(self.values.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def set(self, value: float, *label_values):
+        self.values[label_values] = value
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus two adds"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self.series: Dict[tuple, list] = {}  # labels -> per-bucket counts (last is +Inf), then sum
+        self.lock = threading.Lock()
+        metrics_registry.append(self)
+    
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def render(self) -> List[str]:
+        lines = []
+        for key, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+def render_metrics() -> str:
+    lines = []
+    for metric in metrics_registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+http_requests_total = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+db_command_seconds = Histogram("db_command_duration_seconds", "MongoDB command latency", ("command",))
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "MongoDB commands issued per HTTP request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+external_call_seconds = Histogram("external_call_duration_seconds", "Latency of calls to third-party APIs", ("service",))
+external_call_errors = Counter("external_call_errors_total", "Failed calls to third-party APIs", ("service",))
+cache_requests = Counter("cache_requests_total", "Cache lookups by outcome", ("cache", "result"))
+event_loop_lag = Gauge("event_loop_lag_seconds", "Most recent event loop scheduling delay")
+event_loop_lag_seconds = Histogram("event_loop_lag_duration_seconds", "Event loop scheduling delay samples")
+event_loop_blocks = Counter("event_loop_blocks_total", "Event loop stalls above LOOP_BLOCK_THRESHOLD_MS by blocking function", ("site",))
+payments_reconciled = Counter("payments_reconciled_total", "Stale pending checkouts checked with Stripe, by outcome", ("outcome",))
+
+class track_external:
+    """Times a block that calls a third-party API: `with track_external("stripe"): ...`"""
+    __slots__ = ("service", "started")
+    
+    def __init__(self, service: str):
+        self.service = service
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        external_call_seconds.observe(time.perf_counter() - self.started, self.service)
+        if exc_type is not None:
+            external_call_errors.inc(self.service)
+        return False
+
+def record_cache(cache: str, hit: bool):
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+def route_label(scope) -> str:
+    """Route template for labels; unmatched paths share one label to keep cardinality bounded"""
+    route = scope.get("route")
+    return route.path if route else "unmatched"
+
+class MetricsMiddleware:
+    """Records request count, latency and in-flight gauge per route template"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.inc(amount=-1)
+            route = route_label(scope)
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], route)
+            http_requests_total.inc(scope["method"], route, str(status))
+
+class LoopWatchdog:
+    """Measures event loop scheduling delay and captures the stack of whatever blocks it.
+    
+    A heartbeat task stamps last_beat every interval. A daemon thread watches the
+    stamp and, once it is older than the threshold, snapshots the loop thread's
+    frames while the blocking call is still on the stack.
+    """
+    
+    def __init__(self, interval: float, threshold_ms: float, max_events: int = 50):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.events = deque(maxlen=max_events)  # most recent stalls, newest last
+        self.last_beat = time.monotonic()
+        self.pending_stack: Optional[List[str]] = None
+        self.loop_thread_id = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+    
+    def start(self) -> asyncio.Task:
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        return asyncio.create_task(self._heartbeat())
+    
+    def stalled_for(self, now: float) -> float:
+        return now - self.last_beat - self.interval
+    
+    async def _heartbeat(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                with self.lock:
+                    lag = max(self.stalled_for(now), 0)
+                    stack, self.pending_stack = self.pending_stack, None
+                    self.last_beat = now
+                event_loop_lag.set(lag)
+                event_loop_lag_seconds.observe(lag)
+                if lag > self.threshold:
+                    self._record(lag, stack, now)
+        finally:
+            self.stopped.set()
+    
+    def _watch(self):
+        while not self.stopped.wait(self.threshold / 2):
+            with self.lock:
+                if self.pending_stack is None and self.stalled_for(time.monotonic()) > self.threshold:
+                    frame = sys._current_frames().get(self.loop_thread_id)
+                    if frame is not None:
+                        self.pending_stack = [
+                            f"{entry.filename}:{entry.lineno} in {entry.name}"
+                            for entry in traceback.extract_stack(frame)[-12:]
+                        ]
+    
+    def _record(self, lag: float, stack: Optional[List[str]], ended: float):
+        site = blocking_site(stack)
+        self.events.append({"ended": ended, "blocked_ms": lag * 1000, "site": site, "stack": stack or []})
+        event_loop_blocks.inc(site)
+        if stack:
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms in {site}:\n  " + "\n  ".join(stack))
+        else:
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms (ended before its stack was captured)")
+    
+    def blocks_since(self, started: float) -> List[dict]:
+        """Stalls that ended after started, plus one still in progress"""
+        now = time.monotonic()
+        blocks = [event for event in list(self.events) if event["ended"] > started]
+        stalled = self.stalled_for(now)
+        if stalled > self.threshold:
+            stack = self.pending_stack
+            blocks.append({"ended": now, "blocked_ms": stalled * 1000, "site": blocking_site(stack), "stack": stack or []})
+        return blocks
+
+def blocking_site(stack: Optional[List[str]]) -> str:
+    """Innermost frame in our own code, a bounded label for the blocking call site"""
+    for entry in reversed(stack or []):
+        if entry.startswith(str(ROOT_DIR)) and "/site-packages/" not in entry:
+            return entry.rsplit(" in ", 1)[-1]
+    return "unknown"
+
+class LoopBlockStrictMiddleware:
+    """Debug/test mode: answers 500 for any request during which the loop was blocked
+    longer than limit_ms, so sync calls in async handlers fail the test suite.
+    Reports the longest stall in X-Loop-Blocked-Ms."""
+    
+    def __init__(self, app, watchdog: LoopWatchdog, limit_ms: float):
+        self.app = app
+        self.watchdog = watchdog
+        self.limit_ms = limit_ms
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.monotonic()
+        failed = False
+        
+        async def send_checked(message):
+            nonlocal failed
+            if failed:
+                return
+            if message["type"] == "http.response.start":
+                worst = max(self.watchdog.blocks_since(started), key=lambda block: block["blocked_ms"], default=None)
+                blocked_ms = worst["blocked_ms"] if worst else 0
+                if blocked_ms > self.limit_ms:
+                    failed = True
+                    logger.error(f"{scope['method']} {scope['path']} blocked the event loop for {blocked_ms:.0f} ms in {worst['site']}")
+                    response = StarletteResponse(
+                        content=json.dumps({
+                            "detail": f"Event loop blocked for {blocked_ms:.0f} ms in {worst['site']}",
+                            "stack": worst["stack"]
+                        }),
+                        status_code=500,
+                        media_type="application/json",
+                        headers={"X-Loop-Blocked-Ms": f"{blocked_ms:.0f}"}
+                    )
+                    await response(scope, receive, send)
+                    return
+                message["headers"] = list(message.get("headers", [])) + [(b"x-loop-blocked-ms", f"{blocked_ms:.0f}".encode())]
+            await send(message)
+        
+        await self.app(scope, receive, send_checked)
+
+loop_watchdog = LoopWatchdog(
+    LOOP_LAG_SAMPLE_INTERVAL,
+    min(LOOP_BLOCK_THRESHOLD_MS, LOOP_BLOCK_STRICT_MS) if LOOP_BLOCK_STRICT_MS else LOOP_BLOCK_THRESHOLD_MS
+)
+
+route_db_stats: Dict[str, dict] = {}
+
+class DbQueryStatsMiddleware:
+    """Counts Mongo commands per request, reports them in X-DB-Query-Count / X-DB-Time-Ms
+    and warns when a route goes over DB_QUERY_BUDGET (usually an N+1 loop)."""
+    
+    def __init__(self, app, budget: int):
+        self.app = app
+        self.budget = budget
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.total_ms:.1f}".encode())
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            request_db_stats.reset(token)
+            label = route_label(scope)
+            route_key = f"{scope['method']} {label}"
+            totals = route_db_stats.setdefault(route_key, {"requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0})
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["db_ms"] += stats.total_ms
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+            db_queries_per_request.observe(stats.count, scope["method"], label)
+            if stats.count > self.budget:
+                by_command = {}
+                for name, _ in stats.commands:
+                    by_command[name] = by_command.get(name, 0) + 1
+                logger.warning(
+                    f"Query budget exceeded: {route_key} made {stats.count} DB calls "
+                    f"({stats.total_ms:.1f} ms) > {self.budget}: {by_command}"
+                )
+
+class LoadSheddingMiddleware:
+    """Caps in-flight HTTP requests per worker and answers the excess with 503 + Retry-After.
+    
+    Past the cap, queueing only makes every request slow; rejecting early
+    keeps latency bounded for the requests we do accept.
+    """
+    
+    def __init__(self, app, max_in_flight: int, retry_after: int = 1):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight:
+            logger.warning(f"Shedding request to {scope['path']}: {self.in_flight} in flight")
+            response = StarletteResponse(
+                content=json.dumps({"detail": "Server is busy, please retry shortly"}),
+                status_code=503,
+                media_type="application/json",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+# ============= Compression =============
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "text/")
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br if brotli is installed and the client takes it, else gzip, else None"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0 or accepted.get("*", 0) > 0:
+        return "gzip"
+    return None
+
+def compress_body(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    compressor = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress(body) + compressor.flush()
+
+def stream_compressor(encoding: str):
+    """(compress, finish) callables for a streamed body"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+class CompressionMiddleware:
+    """Compresses text and JSON responses of at least minimum_size bytes, streamed ones included.
+    
+    Responses that already carry a Content-Encoding (pre-compressed cached
+    payloads) and partial or empty responses pass through untouched.
+    """
+    
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start = None  # held back until the first body chunk decides whether to compress
+        passthrough = False
+        compress = finish = None
+        
+        async def send_compressed(message):
+            nonlocal start, passthrough, compress, finish
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compress is None:
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                vary = [token.strip().lower() for token in headers.get("vary", "").split(",")]
+                if "accept-encoding" not in vary:  # CachedPayload responses already carry it
+                    headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send({**start, "headers": headers.raw})
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                if not more_body:
+                    if len(body) > COMPRESSION_OFFLOAD_BYTES:
+                        body = await asyncio.to_thread(compress_body, body, encoding)
+                    else:
+                        body = compress_body(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    passthrough = True
+                    await send({**start, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                compress, finish = stream_compressor(encoding)
+                await send({**start, "headers": headers.raw})
+            
+            chunk = compress(body) if body else b""
+            if not more_body:
+                chunk += finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
+
+class CachedPayload:
+    """A JSON body serialized once, plus gzip/brotli copies when it is big enough to be worth it"""
+    __slots__ = ("body", "encoded", "expires_at")
+    
+    def __init__(self, content, ttl: Optional[float] = None):
+        self.body = orjson.dumps(content)
+        self.encoded = {}
+        if len(self.body) >= COMPRESSION_MIN_BYTES:
+            self.encoded["gzip"] = compress_body(self.body, "gzip", CACHED_COMPRESSION_LEVEL)
+            if brotli:
+                self.encoded["br"] = compress_body(self.body, "br", CACHED_COMPRESSION_LEVEL)
+        self.expires_at = time.monotonic() + ttl if ttl is not None else None
+    
+    def response(self, request: Request) -> StarletteResponse:
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        body = self.body
+        if encoding in self.encoded:
+            body = self.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        return StarletteResponse(content=body, media_type="application/json", headers=headers)
+
+class PayloadCache:
+    """Per-worker LRU of CachedPayloads. Writes in this worker clear it; the TTL
+    bounds how stale it can be after writes handled by other workers."""
+    
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+    
+    def get(self, key) -> Optional[CachedPayload]:
+        payload = self.entries.get(key)
+        if payload is not None and payload.expires_at < time.monotonic():
+            del self.entries[key]
+            payload = None
+        record_cache(self.name, payload is not None)
+        if payload is not None:
+            self.entries.move_to_end(key)
+        return payload
+    
+    def put(self, key, content) -> CachedPayload:
+        payload = CachedPayload(content, self.ttl)
+        self.entries[key] = payload
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return payload
+    
+    def clear(self):
+        self.entries.clear()
+
+job_list_cache = PayloadCache("job_list", JOB_LIST_CACHE_TTL, JOB_LIST_CACHE_MAX_ENTRIES)
+
+def invalidate_job_lists():
+    """Call after any write that changes what a job list shows (jobs, statuses, bid counts)"""
+    job_list_cache.clear()
+
+# ============= Idempotency Keys =============
+
+IDEMPOTENT_ROUTES = [re.compile(pattern) for pattern in (
+    r"/api/jobs",
+    r"/api/jobs/[^/]+/bids",
+    r"/api/messages",
+    r"/api/payments/escrow/create",
+)]
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+def idempotency_error(status_code: int, detail: str, headers: Optional[dict] = None) -> ORJSONResponse:
+    return ORJSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+
+async def claim_idempotency_key(user_id: str, key: str, fingerprint: str, claim: str) -> Optional[StarletteResponse]:
+    """None once this request owns the key under `claim`; otherwise the response to send instead.
+    The unique (user_id, key) index does the locking, so duplicates only contend on
+    their own key: they poll its record until the first request stores its response."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.idempotency_keys.insert_one({
+                "user_id": user_id,
+                "key": key,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "claim": claim,
+                "created_at": now,
+                "expires_at": now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        
+        record = await db.idempotency_keys.find_one({"user_id": user_id, "key": key}, {"_id": 0})
+        if record is None:
+            continue  # the first attempt failed and released the key
+        if record["fingerprint"] != fingerprint:
+            return idempotency_error(422, "Idempotency-Key was already used for a different request")
+        if record["status"] == "completed":
+            return StarletteResponse(
+                content=record["response_body"],
+                status_code=record["response_status"],
+                media_type=record.get("response_type"),
+                headers={"Idempotent-Replayed": "true"}
+            )
+        created_at = record["created_at"].replace(tzinfo=timezone.utc)
+        if now - created_at > timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+            await db.idempotency_keys.delete_one(
+                {"user_id": user_id, "key": key, "status": "in_progress", "claim": record.get("claim")}
+            )
+            continue
+        if time.monotonic() >= deadline:
+            return idempotency_error(409, "A request with this Idempotency-Key is still in progress", {"Retry-After": "1"})
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+class IdempotencyMiddleware:
+    """Makes retried creates safe: a POST to IDEMPOTENT_ROUTES carrying an Idempotency-Key
+    runs once per key and user, and repeats get the stored response back.
+    
+    Only answers the client can act on are stored. 5xx and 429 release the key so
+    the retry runs for real. Reusing a key with a different body is a 422.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not any(pattern.fullmatch(scope["path"]) for pattern in IDEMPOTENT_ROUTES)):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        key = request.headers.get("idempotency-key")
+        user_id = token_user_id(request)
+        if not key or not user_id:
+            await self.app(scope, receive, send)  # no key, or auth will reject it anyway
+            return
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await idempotency_error(400, f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters")(scope, receive, send)
+            return
+        
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(scope["path"].encode() + b"\n" + body).hexdigest()
+        
+        claim = secrets.token_hex(16)
+        response = await claim_idempotency_key(user_id, key, fingerprint, claim)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        
+        body_sent = False
+        
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        
+        status, content_type, response_chunks = 500, None, []
+        
+        async def capture(message):
+            nonlocal status, content_type
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = Headers(raw=message.get("headers", [])).get("content-type")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+        
+        # Scoped to our claim: if it went stale and another request took the key over,
+        # releasing or completing must not touch that request's record
+        record = {"user_id": user_id, "key": key, "status": "in_progress", "claim": claim}
+        try:
+            await self.app(scope, replay_receive, capture)
+        except BaseException:
+            await db.idempotency_keys.delete_one(record)
+            raise
+        if status >= 500 or status == 429:
+            await db.idempotency_keys.delete_one(record)
+        else:
+            await db.idempotency_keys.update_one(record, {"$set": {
+                "status": "completed",
+                "response_status": status,
+                "response_type": content_type,
+                "response_body": b"".join(response_chunks)
+            }})
+
+# ============= Request Loaders =============
+
+# Per-request state, shared by everything the request runs (including /batch sub-requests)
+request_cache: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_cache", default=None)
+
+class DocumentLoader:
+    """Looks documents up by id. load() calls made in the same loop tick go out as one
+    $in query and each id is fetched once, so handlers can load per item without N+1.
+    Results are shared between callers: copy before mutating. Each caller gets the
+    shared future behind asyncio.shield, so a cancelled caller (a /batch sub-request,
+    a client disconnect) can't cancel it for everyone else."""
+    
+    def __init__(self, collection, projection: dict):
+        self.collection = collection
+        self.projection = projection
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.queued: List[str] = []
+    
+    def load(self, doc_id: str) -> asyncio.Future:
+        future = self.futures.get(doc_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.futures[doc_id] = loop.create_future()
+            if not self.queued:
+                loop.call_soon(self._dispatch)
+            self.queued.append(doc_id)
+        return asyncio.shield(future)
+    
+    async def load_many(self, doc_ids) -> List[Optional[dict]]:
+        return await asyncio.gather(*(self.load(doc_id) for doc_id in doc_ids))
+    
+    def _dispatch(self):
+        doc_ids, self.queued = self.queued, []
+        asyncio.ensure_future(self._fetch(doc_ids))
+    
+    async def _fetch(self, doc_ids: List[str]):
+        try:
+            docs = await self.collection.find({"id": {"$in": doc_ids}}, self.projection).to_list(None)
+        except Exception as e:
+            for doc_id in doc_ids:
+                future = self.futures.pop(doc_id)  # forgotten so a later load retries
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_id = {doc["id"]: doc for doc in docs}
+        for doc_id in doc_ids:
+            future = self.futures[doc_id]
+            if not future.done():
+                future.set_result(by_id.get(doc_id))
+
+def loader(collection: str, fields: Optional[tuple] = None) -> DocumentLoader:
+    """The current request's loader for users, jobs or bids, optionally limited to some fields.
+    Outside a request (background tasks) calls still coalesce but nothing is memoized."""
+    projection = {"_id": 0, "id": 1, **{name: 1 for name in fields}} if fields else {"_id": 0}
+    cache = request_cache.get()
+    if cache is None:
+        return DocumentLoader(db[collection], projection)
+    key = ("loader", collection, fields)
+    if key not in cache:
+        cache[key] = DocumentLoader(db[collection], projection)
+    return cache[key]
+
+async def count_bids(job_ids: List[str]) -> Dict[str, int]:
+    """Bid counts for a page of jobs in one aggregate"""
+    counts = await db.bids.aggregate([
+        {"$match": {"job_id": {"$in": job_ids}}},
+        {"$group": {"_id": "$job_id", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    by_job = {c["_id"]: c["count"] for c in counts}
+    return {job_id: by_job.get(job_id, 0) for job_id in job_ids}
+
+class RequestCacheMiddleware:
+    """Starts every HTTP request with an empty request_cache"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_cache.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_cache.reset(token)
+
 # ============= Auth Helpers =============
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+async def hash_password(password: str) -> str:
+    # bcrypt is deliberately slow (~200 ms); run it on a thread so it doesn't stall the loop
+    hashed = await asyncio.to_thread(bcrypt.hashpw, password.encode(), bcrypt.gensalt())
+    return hashed.decode()
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+async def verify_password(password: str, hashed: str) -> bool:
+    return await asyncio.to_thread(bcrypt.checkpw, password.encode(), hashed.encode())
 
 def create_token(user_id: str, email: str, user_type: str) -> str:
     payload = {
@@ -231,29 +1311,36 @@ def create_token(user_id: str, email: str, user_type: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def check_rate_limit(email: str) -> bool:
-    """Check if user is rate limited. Returns True if allowed, False if blocked."""
-    now = datetime.now(timezone.utc).timestamp()
-    # Clean old attempts
-    login_attempts[email] = [t for t in login_attempts[email] if now - t < LOCKOUT_DURATION]
-    # Check if too many attempts
-    if len(login_attempts[email]) >= MAX_LOGIN_ATTEMPTS:
+def client_ip(request: Request) -> str:
+    """Client address: the socket peer, or the X-Forwarded-For hop our TRUSTED_PROXY_HOPS proxies appended"""
+    forwarded = request.headers.get("x-forwarded-for")
+    if TRUSTED_PROXY_HOPS and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        return hops[max(len(hops) - TRUSTED_PROXY_HOPS, 0)]
+    return request.client.host if request.client else "unknown"
+
+async def check_rate_limit(request: Request, email: str) -> bool:
+    """Check if this email or client IP is rate limited. Returns True if allowed, False if blocked."""
+    if await login_limiter.is_limited(email.lower()):
+        return False
+    if await ip_login_limiter.is_limited(client_ip(request)):
         return False
     return True
 
-def record_login_attempt(email: str):
-    """Record a failed login attempt"""
-    login_attempts[email].append(datetime.now(timezone.utc).timestamp())
+async def record_login_attempt(request: Request, email: str):
+    """Record a failed login attempt against both the email and the client IP"""
+    await login_limiter.record(email.lower())
+    await ip_login_limiter.record(client_ip(request))
 
-def clear_login_attempts(email: str):
+async def clear_login_attempts(email: str):
     """Clear login attempts after successful login"""
-    login_attempts[email] = []
+    await login_limiter.reset(email.lower())
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+        user = await loader("users").load(payload["user_id"])
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -279,24 +1366,143 @@ async def send_email_notification(to_email: str, subject: str, html_content: str
     
     try:
         params = {
-            "from": "Build Launch <notifications@buildlaunch.ca>",
+            "from": EMAIL_FROM,
             "to": [to_email],
             "subject": subject,
             "html": html_content
         }
-        resend.Emails.send(params)
+        with track_external("resend"):
+            await asyncio.to_thread(resend.Emails.send, params)
         logger.info(f"Email sent to {to_email}: {subject}")
         return True
     except Exception as e:
         logger.error(f"Failed to send email to {to_email}: {e}")
         return False
 
+def wants_digest(user: dict) -> bool:
+    return (user.get("notification_preferences") or {}).get("email_frequency") == "digest"
+
+async def queue_digest_event(recipient: dict, summary_html: str):
+    """Hold a notification for the recipient's next digest email"""
+    await db.notification_events.insert_one({
+        "id": str(uuid.uuid4()),
+        "recipient_id": recipient["id"],
+        "recipient_email": recipient["email"],
+        "recipient_name": recipient["full_name"],
+        "summary": summary_html,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    })
+
+def render_digest_email(name: str, summaries: List[str]) -> str:
+    items = "".join(
+        f'<div style="background: #f8f9fa; padding: 16px; border-radius: 8px; margin: 16px 0;">{summary}</div>'
+        for summary in summaries
+    )
+    return f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <h2 style="color: #0ea5e9;">Your Build Launch Updates</h2>
+        <p>Hi {name},</p>
+        <p>Here's what happened on your jobs since your last update:</p>
+        {items}
+        <p>Log in to Build Launch to review the details.</p>
+        <p style="color: #6b7280; font-size: 12px; margin-top: 24px;">
+            Build Launch - Renovation Marketplace<br>
+            Phone: 416-697-1728
+        </p>
+    </div>
+    """
+
+async def flush_notification_digests() -> int:
+    """Send one email per recipient whose oldest pending event has aged past the digest window.
+    
+    Every worker runs this, so the due events are claimed first and each worker only
+    sends and deletes its own claim. A claim left by a crashed worker is retaken after
+    DIGEST_CLAIM_SECONDS; the batch idempotency key, derived from the event ids, lets
+    Resend drop the repeat if that worker had already sent it.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(minutes=DIGEST_WINDOW_MINUTES)).isoformat()
+    claimable = {"$or": [
+        {"claimed_at": {"$exists": False}},
+        {"claimed_at": {"$lt": (now - timedelta(seconds=DIGEST_CLAIM_SECONDS)).isoformat()}}
+    ]}
+    # A recipient is due as soon as any of their events is older than the window
+    recipients = await db.notification_events.distinct(
+        "recipient_id", {"created_at": {"$lte": cutoff}, **claimable}
+    )
+    if not recipients:
+        return 0
+    if not RESEND_API_KEY:
+        logger.warning("Resend API key not configured, skipping digest emails")
+        return 0
+    
+    claim = str(uuid.uuid4())
+    await db.notification_events.update_many(
+        {"recipient_id": {"$in": recipients}, **claimable},
+        {"$set": {"claimed_by": claim, "claimed_at": now.isoformat()}}
+    )
+    due = await db.notification_events.aggregate([
+        {"$match": {"claimed_by": claim}},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": "$recipient_id",
+            "email": {"$last": "$recipient_email"},
+            "name": {"$last": "$recipient_name"},
+            "summaries": {"$push": "$summary"},
+            "ids": {"$push": "$id"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]).to_list(None)
+    
+    sent = 0
+    for start in range(0, len(due), RESEND_BATCH_LIMIT):
+        chunk = due[start:start + RESEND_BATCH_LIMIT]
+        event_ids = [event_id for digest in chunk for event_id in digest["ids"]]
+        params = [{
+            "from": EMAIL_FROM,
+            "to": [digest["email"]],
+            "subject": f"{len(digest['summaries'])} new updates on Build Launch",
+            "html": render_digest_email(digest["name"], digest["summaries"])
+        } for digest in chunk]
+        idempotency_key = "digest-" + hashlib.sha256(",".join(event_ids).encode()).hexdigest()
+        try:
+            with track_external("resend"):
+                await asyncio.to_thread(resend.Batch.send, params, {"idempotency_key": idempotency_key})
+        except Exception as e:
+            # Release the claim so the events go out with the next sweep
+            logger.error(f"Failed to send digest batch: {e}")
+            await db.notification_events.update_many(
+                {"claimed_by": claim, "id": {"$in": event_ids}},
+                {"$unset": {"claimed_by": "", "claimed_at": ""}}
+            )
+            continue
+        await db.notification_events.delete_many({"claimed_by": claim, "id": {"$in": event_ids}})
+        sent += len(chunk)
+    
+    logger.info(f"Sent {sent} notification digests")
+    return sent
+
+async def run_digest_scheduler():
+    while True:
+        await asyncio.sleep(DIGEST_FLUSH_INTERVAL)
+        try:
+            await flush_notification_digests()
+        except Exception as e:
+            logger.error(f"Digest flush failed: {e}")
+
 async def notify_new_bid(job: dict, bid: dict, contractor_name: str):
     """Notify homeowner about a new bid on their job"""
-    homeowner = await db.users.find_one({"id": job["homeowner_id"]}, {"_id": 0})
+    homeowner = await loader("users").load(job["homeowner_id"])
     if not homeowner:
         return
     
+    if wants_digest(homeowner):
+        await queue_digest_event(homeowner, f"""
+            <p><strong>New bid on {job['title']}</strong></p>
+            <p>{contractor_name} bid ${bid['amount']:,.2f} CAD ({bid['estimated_days']} days)</p>
+        """)
+        return
+    
     html = f"""
     <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
         <h2 style="color: #0ea5e9;">New Bid on Your Job!</h2>
@@ -319,7 +1525,7 @@ async def notify_new_bid(job: dict, bid: dict, contractor_name: str):
 
 async def notify_bid_accepted(bid: dict, job: dict):
     """Notify contractor that their bid was accepted"""
-    contractor = await db.users.find_one({"id": bid["contractor_id"]}, {"_id": 0})
+    contractor = await loader("users").load(bid["contractor_id"])
     if not contractor:
         return
     
@@ -342,10 +1548,14 @@ async def notify_bid_accepted(bid: dict, job: dict):
     </div>
     """
     await send_email_notification(contractor['email'], f"Your Bid Was Accepted - {job['title']}", html)
+    send_sms_notification(
+        contractor.get("phone"),
+        f"Build Launch: your bid of ${bid['amount']:,.2f} on \"{job['title']}\" was accepted. Escrow is secured."
+    )
 
 async def notify_job_completed(job: dict, payout_amount: float):
     """Notify contractor about job completion and payment release"""
-    contractor = await db.users.find_one({"id": job["awarded_contractor_id"]}, {"_id": 0})
+    contractor = await loader("users").load(job["awarded_contractor_id"])
     if not contractor:
         return
     
@@ -367,10 +1577,14 @@ async def notify_job_completed(job: dict, payout_amount: float):
     </div>
     """
     await send_email_notification(contractor['email'], f"Payment Released - {job['title']}", html)
+    send_sms_notification(
+        contractor.get("phone"),
+        f"Build Launch: ${payout_amount:,.2f} CAD was released to you for \"{job['title']}\"."
+    )
 
 async def notify_payment_funded(job: dict):
     """Notify homeowner that escrow has been funded"""
-    homeowner = await db.users.find_one({"id": job["homeowner_id"]}, {"_id": 0})
+    homeowner = await loader("users").load(job["homeowner_id"])
     if not homeowner:
         return
     
@@ -393,6 +1607,117 @@ async def notify_payment_funded(job: dict):
     """
     await send_email_notification(homeowner['email'], f"Escrow Payment Confirmed - {job['title']}", html)
 
+# ============= SMS Notification Helpers =============
+
+class SmsDispatcher:
+    """Sends queued SMS from a background task, paced to Twilio's throughput.
+    
+    The Twilio SDK is blocking, so each send runs on a small thread pool.
+    Queued messages are drained in batches and retried with backoff on
+    rate-limit, server and network errors.
+    """
+    
+    def __init__(self, client, from_number: str, rate_per_second: float, batch_size: int, max_retries: int,
+                 retry_backoff: float = 1.0):
+        self.client = client
+        self.from_number = from_number
+        self.interval = 1 / rate_per_second
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = asyncio.Queue(maxsize=1000)
+        self.executor = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="sms")
+        self._next_slot = 0.0
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self, timeout: float = 10):
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out flushing SMS queue on shutdown, pending messages dropped")
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+    
+    def enqueue(self, to_phone: str, body: str) -> bool:
+        try:
+            self.queue.put_nowait((to_phone, body))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"SMS queue full, dropping message to {to_phone}")
+            return False
+    
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await asyncio.gather(*(self._send(to_phone, body) for to_phone, body in batch))
+            for _ in batch:
+                self.queue.task_done()
+    
+    async def _acquire_slot(self):
+        """Reserve the next send slot so we never exceed rate_per_second"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._next_slot = max(self._next_slot, now)
+        delay = self._next_slot - now
+        self._next_slot += self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    async def _send(self, to_phone: str, body: str):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_slot()
+            try:
+                with track_external("twilio"):
+                    await loop.run_in_executor(
+                        self.executor,
+                        lambda: self.client.messages.create(to=to_phone, from_=self.from_number, body=body)
+                    )
+                logger.info(f"SMS sent to {to_phone}")
+                return True
+            except TwilioRestException as e:
+                if e.status != 429 and e.status < 500:
+                    logger.error(f"Twilio rejected SMS to {to_phone}: {e.msg}")
+                    return False
+                error = e
+            except Exception as e:
+                error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        logger.error(f"Failed to send SMS to {to_phone} after {self.max_retries + 1} attempts: {error}")
+        return False
+
+sms_dispatcher = None
+if twilio_client and TWILIO_PHONE_NUMBER:
+    sms_dispatcher = SmsDispatcher(twilio_client, TWILIO_PHONE_NUMBER, SMS_RATE_PER_SECOND, SMS_BATCH_SIZE, SMS_MAX_RETRIES)
+
+def normalize_phone(phone: str) -> Optional[str]:
+    """Convert a user-entered North American number to E.164, or None if it can't be"""
+    if phone.strip().startswith("+"):
+        return "+" + re.sub(r"\D", "", phone)
+    digits = re.sub(r"\D", "", phone)
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith("1"):
+        return f"+{digits}"
+    return None
+
+def send_sms_notification(phone: Optional[str], body: str) -> bool:
+    """Queue an SMS for background delivery"""
+    if not sms_dispatcher:
+        logger.warning("Twilio not configured, skipping SMS")
+        return False
+    to_phone = normalize_phone(phone) if phone else None
+    if not to_phone:
+        return False
+    return sms_dispatcher.enqueue(to_phone, body)
+
 # ============= Auth Endpoints =============
 
 @api_router.post("/auth/register")
@@ -405,7 +1730,7 @@ async def register(user_data: UserCreate):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "full_name": user_data.full_name,
         "user_type": user_data.user_type,
         "phone": user_data.phone,
@@ -432,20 +1757,24 @@ async def register(user_data: UserCreate):
     }
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
     # Check rate limiting
-    if not check_rate_limit(credentials.email):
-        logger.warning(f"Rate limit exceeded for: {credentials.email}")
-        raise HTTPException(status_code=429, detail="Too many login attempts. Please try again in 5 minutes.")
+    if not await check_rate_limit(request, credentials.email):
+        logger.warning(f"Rate limit exceeded for: {credentials.email} from {client_ip(request)}")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please try again in 5 minutes.",
+            headers={"Retry-After": str(LOCKOUT_DURATION)}
+        )
     
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
-        record_login_attempt(credentials.email)
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
+        await record_login_attempt(request, credentials.email)
         logger.warning(f"Failed login attempt for: {credentials.email}")
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Clear rate limit on successful login
-    clear_login_attempts(credentials.email)
+    await clear_login_attempts(credentials.email)
     logger.info(f"User logged in: {credentials.email}")
     
     token = create_token(user["id"], user["email"], user["user_type"])
@@ -463,11 +1792,15 @@ async def login(credentials: UserLogin):
     }
 
 @api_router.post("/auth/admin-login")
-async def admin_login(credentials: UserLogin):
+async def admin_login(credentials: UserLogin, request: Request):
     """Special login endpoint for admin users"""
     # Check rate limiting
-    if not check_rate_limit(credentials.email):
-        raise HTTPException(status_code=429, detail="Too many login attempts. Please try again in 5 minutes.")
+    if not await check_rate_limit(request, credentials.email):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please try again in 5 minutes.",
+            headers={"Retry-After": str(LOCKOUT_DURATION)}
+        )
     
     # Check if admin credentials match env vars (for initial admin)
     if credentials.email == ADMIN_EMAIL and credentials.password == ADMIN_PASSWORD:
@@ -478,7 +1811,7 @@ async def admin_login(credentials: UserLogin):
             admin_doc = {
                 "id": admin_id,
                 "email": ADMIN_EMAIL,
-                "password_hash": hash_password(ADMIN_PASSWORD),
+                "password_hash": await hash_password(ADMIN_PASSWORD),
                 "full_name": "Build Launch Admin",
                 "user_type": "admin",
                 "phone": "416-697-1728",
@@ -489,7 +1822,7 @@ async def admin_login(credentials: UserLogin):
             await db.users.insert_one(admin_doc)
             admin = admin_doc
         
-        clear_login_attempts(credentials.email)
+        await clear_login_attempts(credentials.email)
         logger.info(f"Admin logged in: {credentials.email}")
         token = create_token(admin["id"], admin["email"], "admin")
         return {
@@ -505,11 +1838,11 @@ async def admin_login(credentials: UserLogin):
     
     # Check database for admin user
     admin = await db.users.find_one({"email": credentials.email, "user_type": "admin"}, {"_id": 0})
-    if not admin or not verify_password(credentials.password, admin["password_hash"]):
-        record_login_attempt(credentials.email)
+    if not admin or not await verify_password(credentials.password, admin["password_hash"]):
+        await record_login_attempt(request, credentials.email)
         raise HTTPException(status_code=401, detail="Invalid admin credentials")
     
-    clear_login_attempts(credentials.email)
+    await clear_login_attempts(credentials.email)
     token = create_token(admin["id"], admin["email"], "admin")
     return {
         "token": token,
@@ -531,9 +1864,19 @@ async def get_me(user: dict = Depends(get_current_user)):
         "user_type": user["user_type"],
         "phone": user.get("phone"),
         "verified": user.get("verified", False),
-        "verification": user.get("verification")
+        "verification": user.get("verification"),
+        "notification_preferences": user.get("notification_preferences") or {"email_frequency": "immediate"}
     }
 
+@api_router.put("/auth/notification-preferences")
+async def update_notification_preferences(preferences: NotificationPreferences, user: dict = Depends(get_current_user)):
+    """Choose between an email per event or a periodic digest"""
+    await db.users.update_one(
+        {"id": user["id"]},
+        {"$set": {"notification_preferences": preferences.model_dump()}}
+    )
+    return {"message": "Notification preferences updated", "notification_preferences": preferences.model_dump()}
+
 @api_router.put("/auth/profile")
 async def update_profile(updates: dict, user: dict = Depends(get_current_user)):
     allowed_fields = ["full_name", "phone"]
@@ -557,6 +1900,71 @@ async def update_contractor_verification(verification: ContractorVerification, u
     )
     return {"message": "Verification updated", "verified": verified}
 
+# ============= Field Projection =============
+
+# Fields list endpoints accept in ?fields=a,b,c, mapped to their Mongo projection.
+# None marks fields computed after the query (bid_count, joined job details).
+JOB_EXCERPT_CHARS = 200
+JOB_FIELDS = {
+    "id": 1, "title": 1, "description": 1, "location": 1, "category": 1, "budget_min": 1, "budget_max": 1,
+    "start_date": 1, "images": 1, "status": 1, "homeowner_id": 1, "homeowner_name": 1, "escrow_amount": 1,
+    "awarded_contractor_id": 1, "created_at": 1,
+    "excerpt": {"$substrCP": [{"$ifNull": ["$description", ""]}, 0, JOB_EXCERPT_CHARS]},
+    "image_count": {"$size": {"$ifNull": ["$images", []]}},
+    "bid_count": None
+}
+# What a job card renders: no full description and at most three images
+JOB_CARD_FIELDS = [
+    "id", "title", "excerpt", "location", "category", "budget_min", "budget_max", "status",
+    "homeowner_id", "homeowner_name", "created_at", "images", "image_count", "bid_count"
+]
+JOB_CARD_IMAGES = 3
+ADMIN_JOB_CARD_FIELDS = [
+    "id", "title", "location", "category", "budget_min", "budget_max", "status", "homeowner_name",
+    "escrow_amount", "awarded_contractor_id", "created_at"
+]
+USER_FIELDS = {
+    "id": 1, "email": 1, "full_name": 1, "user_type": 1, "phone": 1, "verified": 1, "verification": 1,
+    "suspended": 1, "notification_preferences": 1, "created_at": 1
+}
+USER_CARD_FIELDS = ["id", "email", "full_name", "user_type", "phone", "verified", "suspended", "created_at"]
+BID_FIELDS = {
+    "id": 1, "job_id": 1, "contractor_id": 1, "contractor_name": 1, "amount": 1, "message": 1,
+    "estimated_days": 1, "status": 1, "created_at": 1,
+    "job_title": None, "job_status": None, "job_location": None
+}
+BID_CARD_FIELDS = ["id", "job_id", "amount", "estimated_days", "status", "created_at", "job_title", "job_status", "job_location"]
+
+def select_fields(fields: Optional[str], view: str, allowed: Dict[str, object], card: List[str]) -> Optional[Set[str]]:
+    """Fields to return for ?fields= or ?view=card|full; None means whole documents.
+    Unknown names are rejected so a typo doesn't silently drop data."""
+    if fields:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - allowed.keys()
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(sorted(allowed))}"
+            )
+        return requested | {"id"}
+    if view == "full":
+        return None
+    if view == "card":
+        return set(card)
+    raise HTTPException(status_code=400, detail="view must be card or full")
+
+def mongo_projection(selected: Optional[Set[str]], allowed: Dict[str, object], full: Optional[dict] = None) -> dict:
+    if selected is None:
+        return full or {"_id": 0}
+    projection = {"_id": 0}
+    for name in selected:
+        if allowed[name] is not None:
+            projection[name] = allowed[name]
+    return projection
+
+def wants(selected: Optional[Set[str]], name: str) -> bool:
+    return selected is None or name in selected
+
 # ============= Jobs Endpoints =============
 
 @api_router.post("/jobs")
@@ -583,16 +1991,11 @@ async def create_job(job_data: JobCreate, user: dict = Depends(get_current_user)
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.jobs.insert_one(job_doc)
+    invalidate_job_lists()
     return {"id": job_id, "message": "Job posted successfully"}
 
-@api_router.get("/jobs")
-async def get_jobs(
-    location: Optional[str] = None,
-    category: Optional[str] = None,
-    status: Optional[str] = None,
-    min_budget: Optional[float] = None,
-    max_budget: Optional[float] = None
-):
+def open_jobs_query(location: Optional[str] = None, category: Optional[str] = None, status: Optional[str] = None,
+                    min_budget: Optional[float] = None, max_budget: Optional[float] = None) -> dict:
     query = {}
     if location:
         query["location"] = location
@@ -606,17 +2009,54 @@ async def get_jobs(
         query["budget_max"] = {"$gte": min_budget}
     if max_budget:
         query["budget_min"] = {"$lte": max_budget}
-    
-    jobs = await db.jobs.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    for job in jobs:
-        bid_count = await db.bids.count_documents({"job_id": job["id"]})
-        job["bid_count"] = bid_count
-    
+    return query
+
+async def find_jobs(query: dict, selected: Optional[Set[str]], card: bool = False) -> List[dict]:
+    """Newest 100 matching jobs in the selected shape; card lists carry only the first few images"""
+    projection = mongo_projection(selected, JOB_FIELDS)
+    if card:
+        projection["images"] = {"$slice": JOB_CARD_IMAGES}
+    jobs = await db.jobs.find(query, projection).sort("created_at", -1).to_list(100)
+    
+    if wants(selected, "bid_count") and jobs:
+        bid_counts = await count_bids([job["id"] for job in jobs])
+        for job in jobs:
+            job["bid_count"] = bid_counts[job["id"]]
+    if wants(selected, "images"):
+        await attach_image_variants(jobs)
     return jobs
 
-@api_router.get("/jobs/my-jobs")
-async def get_my_jobs(user: dict = Depends(get_current_user)):
+@api_router.get("/jobs", dependencies=[route_rate_limit("jobs_list")])
+async def get_jobs(
+    request: Request,
+    location: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    fields: Optional[str] = None,
+    view: str = "card"
+):
+    """Open jobs as compact cards by default; view=full or fields=a,b,c for other shapes"""
+    payload = await job_list_payload(location, category, status, min_budget, max_budget, fields, view)
+    return payload.response(request)
+
+async def job_list_payload(location: Optional[str] = None, category: Optional[str] = None, status: Optional[str] = None,
+                           min_budget: Optional[float] = None, max_budget: Optional[float] = None,
+                           fields: Optional[str] = None, view: str = "card") -> CachedPayload:
+    """A /jobs listing from job_list_cache, filled on a miss. The defaults are the open job
+    cards, which the contractor dashboard shares with /jobs."""
+    cache_key = (location, category, status, min_budget, max_budget, fields, view)
+    payload = job_list_cache.get(cache_key)
+    if payload is None:
+        selected = select_fields(fields, view, JOB_FIELDS, JOB_CARD_FIELDS)
+        query = open_jobs_query(location, category, status, min_budget, max_budget)
+        jobs = await find_jobs(query, selected, card=fields is None and view == "card")
+        payload = job_list_cache.put(cache_key, jobs)
+    return payload
+
+async def load_my_jobs(user: dict) -> List[dict]:
+    """A homeowner's posted jobs, or the jobs a contractor bid on or was awarded"""
     if user["user_type"] == "homeowner":
         jobs = await db.jobs.find({"homeowner_id": user["id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
     else:
@@ -625,20 +2065,26 @@ async def get_my_jobs(user: dict = Depends(get_current_user)):
         bid_jobs = await db.jobs.find({"id": {"$in": bid_job_ids}}, {"_id": 0}).to_list(100)
         jobs = awarded_jobs + [j for j in bid_jobs if j["id"] not in [a["id"] for a in awarded_jobs]]
     
+    bid_counts = await count_bids([job["id"] for job in jobs]) if jobs else {}
     for job in jobs:
-        bid_count = await db.bids.count_documents({"job_id": job["id"]})
-        job["bid_count"] = bid_count
-    
+        job["bid_count"] = bid_counts[job["id"]]
+    await attach_image_variants(jobs)
     return jobs
 
+@api_router.get("/jobs/my-jobs")
+async def get_my_jobs(user: dict = Depends(get_current_user)):
+    return plain_json(await load_my_jobs(user))
+
 @api_router.get("/jobs/{job_id}")
 async def get_job(job_id: str):
-    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    job = await loader("jobs").load(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    job = dict(job)
     
     bid_count = await db.bids.count_documents({"job_id": job_id})
     job["bid_count"] = bid_count
+    await attach_image_variants([job], detail=True)
     
     return job
 
@@ -654,6 +2100,7 @@ async def update_job(job_id: str, updates: dict, user: dict = Depends(get_curren
     update_data = {k: v for k, v in updates.items() if k in allowed_fields}
     if update_data:
         await db.jobs.update_one({"id": job_id}, {"$set": update_data})
+        invalidate_job_lists()
     
     return {"message": "Job updated"}
 
@@ -669,6 +2116,7 @@ async def delete_job(job_id: str, user: dict = Depends(get_current_user)):
     
     await db.jobs.delete_one({"id": job_id})
     await db.bids.delete_many({"job_id": job_id})
+    invalidate_job_lists()
     return {"message": "Job deleted"}
 
 # ============= Bids Endpoints =============
@@ -701,6 +2149,7 @@ async def create_bid(job_id: str, bid_data: BidCreate, user: dict = Depends(get_
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.bids.insert_one(bid_doc)
+    invalidate_job_lists()
     
     # Send email notification to homeowner
     await notify_new_bid(job, bid_doc, user["full_name"])
@@ -709,7 +2158,7 @@ async def create_bid(job_id: str, bid_data: BidCreate, user: dict = Depends(get_
 
 @api_router.get("/jobs/{job_id}/bids")
 async def get_job_bids(job_id: str, user: dict = Depends(get_current_user)):
-    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    job = await loader("jobs").load(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
@@ -718,29 +2167,45 @@ async def get_job_bids(job_id: str, user: dict = Depends(get_current_user)):
     
     bids = await db.bids.find({"job_id": job_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
     
-    for bid in bids:
-        contractor = await db.users.find_one({"id": bid["contractor_id"]}, {"_id": 0, "password_hash": 0})
+    contractors = await loader("users").load_many(bid["contractor_id"] for bid in bids)
+    for bid, contractor in zip(bids, contractors):
         if contractor:
             bid["contractor_verified"] = contractor.get("verified", False)
             bid["contractor_verification"] = contractor.get("verification")
     
+    return plain_json(bids)
+
+async def load_my_bids(user: dict, selected: Optional[Set[str]]) -> List[dict]:
+    """A contractor's newest 100 bids, joined with the job fields the shape asks for"""
+    projection = mongo_projection(selected, BID_FIELDS)
+    if selected is not None:
+        projection["job_id"] = 1  # needed to join job details; dropped below unless requested
+    bids = await db.bids.find({"contractor_id": user["id"]}, projection).sort("created_at", -1).to_list(100)
+    
+    job_fields = [name for name in ("title", "status", "location") if wants(selected, f"job_{name}")]
+    if job_fields:
+        jobs = await loader("jobs", tuple(job_fields)).load_many(bid["job_id"] for bid in bids)
+        for bid, job in zip(bids, jobs):
+            if job:
+                for name in job_fields:
+                    bid[f"job_{name}"] = job[name]
+    if selected is not None and "job_id" not in selected:
+        for bid in bids:
+            bid.pop("job_id", None)
+    
     return bids
 
 @api_router.get("/bids/my-bids")
-async def get_my_bids(user: dict = Depends(get_current_user)):
+async def get_my_bids(
+    fields: Optional[str] = None,
+    view: str = "card",
+    user: dict = Depends(get_current_user)
+):
     if user["user_type"] != "contractor":
         raise HTTPException(status_code=403, detail="Only contractors can view their bids")
     
-    bids = await db.bids.find({"contractor_id": user["id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    for bid in bids:
-        job = await db.jobs.find_one({"id": bid["job_id"]}, {"_id": 0})
-        if job:
-            bid["job_title"] = job["title"]
-            bid["job_status"] = job["status"]
-            bid["job_location"] = job["location"]
-    
-    return bids
+    selected = select_fields(fields, view, BID_FIELDS, BID_CARD_FIELDS)
+    return plain_json(await load_my_bids(user, selected))
 
 @api_router.put("/bids/{bid_id}/accept")
 async def accept_bid(bid_id: str, user: dict = Depends(get_current_user)):
@@ -759,6 +2224,7 @@ async def accept_bid(bid_id: str, user: dict = Depends(get_current_user)):
     await db.bids.update_one({"id": bid_id}, {"$set": {"status": "accepted"}})
     await db.bids.update_many({"job_id": bid["job_id"], "id": {"$ne": bid_id}}, {"$set": {"status": "rejected"}})
     await db.jobs.update_one({"id": bid["job_id"]}, {"$set": {"status": "awarded", "awarded_contractor_id": bid["contractor_id"]}})
+    invalidate_job_lists()
     
     # Send email notification to contractor
     await notify_bid_accepted(bid, job)
@@ -767,7 +2233,13 @@ async def accept_bid(bid_id: str, user: dict = Depends(get_current_user)):
 
 # ============= Escrow Payment Endpoints =============
 
-@api_router.post("/payments/escrow/create")
+# Swapped for a local fake by the load test runner (see loadtest.py)
+stripe_checkout_factory = StripeCheckout
+
+def get_stripe_checkout(webhook_url: str):
+    return stripe_checkout_factory(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+
+@api_router.post("/payments/escrow/create", dependencies=[route_rate_limit("escrow_create")])
 async def create_escrow_payment(payment_req: EscrowPaymentRequest, request: Request, user: dict = Depends(get_current_user)):
     if user["user_type"] != "homeowner":
         raise HTTPException(status_code=403, detail="Only homeowners can fund escrow")
@@ -782,9 +2254,26 @@ async def create_escrow_payment(payment_req: EscrowPaymentRequest, request: Requ
     
     amount = job["budget_max"]
     
+    # Clicking "Fund escrow" again reuses the open session instead of calling Stripe;
+    # a changed budget or origin needs a new one
+    existing = await db.payment_transactions.find_one(
+        {
+            "job_id": payment_req.job_id,
+            "user_id": user["id"],
+            "payment_status": "pending",
+            "amount": float(amount),
+            "origin_url": payment_req.origin_url,
+            "expires_at": {"$gt": datetime.now(timezone.utc) + CHECKOUT_REUSE_MARGIN}
+        },
+        {"_id": 0, "session_id": 1, "checkout_url": 1},
+        sort=[("expires_at", -1)]
+    )
+    if existing:
+        return {"checkout_url": existing["checkout_url"], "session_id": existing["session_id"]}
+    
     host_url = str(request.base_url).rstrip('/')
     webhook_url = f"{host_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+    stripe_checkout = get_stripe_checkout(webhook_url)
     
     success_url = f"{payment_req.origin_url}/payment-success?session_id={{CHECKOUT_SESSION_ID}}"
     cancel_url = f"{payment_req.origin_url}/jobs/{payment_req.job_id}"
@@ -801,23 +2290,148 @@ async def create_escrow_payment(payment_req: EscrowPaymentRequest, request: Requ
         }
     )
     
-    session: CheckoutSessionResponse = await stripe_checkout.create_checkout_session(checkout_request)
+    with track_external("stripe"):
+        session: CheckoutSessionResponse = await stripe_checkout.create_checkout_session(checkout_request)
     
+    now = datetime.now(timezone.utc)
     transaction_doc = {
         "id": str(uuid.uuid4()),
         "session_id": session.session_id,
+        "checkout_url": session.url,
+        "origin_url": payment_req.origin_url,
         "job_id": payment_req.job_id,
         "user_id": user["id"],
         "amount": float(amount),
         "currency": "cad",
         "payment_type": "escrow",
         "payment_status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now.isoformat(),
+        "expires_at": now + CHECKOUT_SESSION_TTL
     }
     await db.payment_transactions.insert_one(transaction_doc)
     
     return {"checkout_url": session.url, "session_id": session.session_id}
 
+def paid_transaction_update(session_id: str) -> tuple:
+    """Filter and update settling a checkout; matches nothing once it's already paid"""
+    return (
+        {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+        {"$set": {"payment_status": "paid", "status": "complete"}}
+    )
+
+def escrow_funded_update(transaction: dict) -> tuple:
+    """Filter and update moving the transaction's job into escrow, only from open"""
+    return (
+        {"id": transaction["job_id"], "status": "open"},
+        {"$set": {"status": "in_escrow", "escrow_amount": transaction["amount"]}}
+    )
+
+async def mark_transaction_paid(transaction: dict) -> bool:
+    """Settle a paid checkout and fund its job's escrow. False when the webhook,
+    a status poll or the reconciler already did."""
+    result = await db.payment_transactions.update_one(*paid_transaction_update(transaction["session_id"]))
+    if not result.modified_count:
+        return False
+    await db.jobs.update_one(*escrow_funded_update(transaction))
+    invalidate_job_lists()
+    return True
+
+WORKER_ID = str(uuid.uuid4())
+
+async def acquire_lease(name: str, seconds: float) -> bool:
+    """Hold the named lease for the next `seconds` so only one worker runs a periodic task.
+    True while this worker holds it or once the previous holder's lease has lapsed."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.task_leases.update_one(
+            {"name": name, "$or": [{"holder": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": WORKER_ID, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False  # another worker holds it
+    return True
+
+async def reconcile_pending_payments() -> Dict[str, int]:
+    """Ask Stripe about checkouts left pending for RECONCILE_AFTER_MINUTES, where no webhook
+    arrived and the homeowner never came back to the status page. Settles them with
+    bulk writes and the same job transition as the webhook.
+    
+    This is the only place a pending checkout becomes expired: the local expires_at
+    can't tell an abandoned session from a paid one whose webhook was lost."""
+    now = datetime.now(timezone.utc)
+    stale = await db.payment_transactions.find(
+        {
+            "payment_status": "pending",
+            "created_at": {"$lt": (now - timedelta(minutes=RECONCILE_AFTER_MINUTES)).isoformat()}
+        },
+        {"_id": 0, "session_id": 1, "job_id": 1, "amount": 1}
+    ).sort("reconciled_at", 1).limit(RECONCILE_BATCH_SIZE).to_list(RECONCILE_BATCH_SIZE)
+    if not stale:
+        return {}
+    
+    host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+    stripe_checkout = get_stripe_checkout(f"{host_url}/api/webhook/stripe")
+    semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+    
+    async def check(transaction: dict):
+        async with semaphore:
+            try:
+                with track_external("stripe"):
+                    return await stripe_checkout.get_checkout_status(transaction["session_id"])
+            except Exception as e:
+                logger.warning(f"Could not reconcile checkout {transaction['session_id']}: {e}")
+                return None
+    
+    checkout_statuses = await asyncio.gather(*(check(transaction) for transaction in stale))
+    
+    run_id = str(uuid.uuid4())  # tags the rows this run settles, to notify only for those
+    outcome: Dict[str, int] = {}
+    transaction_ops, job_ops = [], []
+    for transaction, checkout_status in zip(stale, checkout_statuses):
+        still_pending = {"session_id": transaction["session_id"], "payment_status": "pending"}
+        if checkout_status is None:
+            result = "failed"
+        elif checkout_status.payment_status == "paid":
+            paid_filter, paid_update = paid_transaction_update(transaction["session_id"])
+            transaction_ops.append(UpdateOne(paid_filter, {"$set": {**paid_update["$set"], "reconcile_run": run_id}}))
+            job_ops.append(UpdateOne(*escrow_funded_update(transaction)))
+            result = "paid"
+        elif checkout_status.status == "expired":
+            transaction_ops.append(UpdateOne(still_pending, {"$set": {"payment_status": "expired", "status": "expired"}}))
+            result = "expired"
+        else:
+            # Still open; checked last next time so other stale rows get a turn
+            transaction_ops.append(UpdateOne(still_pending, {"$set": {"reconciled_at": now}}))
+            result = "pending"
+        outcome[result] = outcome.get(result, 0) + 1
+        payments_reconciled.inc(result)
+    
+    if transaction_ops:
+        await db.payment_transactions.bulk_write(transaction_ops, ordered=False)
+    if job_ops:
+        await db.jobs.bulk_write(job_ops, ordered=False)
+        invalidate_job_lists()
+        # Same email as the status poll, for the payments this run settled rather than
+        # a webhook or poll that got there first
+        settled_job_ids = await db.payment_transactions.distinct("job_id", {"reconcile_run": run_id})
+        funded_jobs = await db.jobs.find(
+            {"id": {"$in": settled_job_ids}, "status": "in_escrow"}, {"_id": 0}
+        ).to_list(None)
+        await asyncio.gather(*(notify_payment_funded(job) for job in funded_jobs))
+    logger.info(f"Reconciled {len(stale)} pending checkouts: {outcome}")
+    return outcome
+
+async def run_payment_reconciler():
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL)
+        try:
+            # Every worker runs this loop; the lease keeps the Stripe calls to one of them
+            if await acquire_lease("payment_reconciler", RECONCILE_LEASE_SECONDS):
+                await reconcile_pending_payments()
+        except Exception as e:
+            logger.error(f"Payment reconciliation failed: {e}")
+
 @api_router.get("/payments/status/{session_id}")
 async def check_payment_status(session_id: str, user: dict = Depends(get_current_user)):
     transaction = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
@@ -829,24 +2443,18 @@ async def check_payment_status(session_id: str, user: dict = Depends(get_current
     
     host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
     webhook_url = f"{host_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+    stripe_checkout = get_stripe_checkout(webhook_url)
     
     try:
-        checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+        with track_external("stripe"):
+            checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
         
         if checkout_status.payment_status == "paid":
-            await db.payment_transactions.update_one(
-                {"session_id": session_id},
-                {"$set": {"payment_status": "paid", "status": "complete"}}
-            )
-            await db.jobs.update_one(
-                {"id": transaction["job_id"]},
-                {"$set": {"status": "in_escrow", "escrow_amount": transaction["amount"]}}
-            )
-            # Send email notification about escrow funding
-            updated_job = await db.jobs.find_one({"id": transaction["job_id"]}, {"_id": 0})
-            if updated_job:
-                await notify_payment_funded(updated_job)
+            if await mark_transaction_paid(transaction):
+                # Send email notification about escrow funding
+                updated_job = await db.jobs.find_one({"id": transaction["job_id"]}, {"_id": 0})
+                if updated_job:
+                    await notify_payment_funded(updated_job)
             return {"status": "paid", "job_id": transaction["job_id"]}
         elif checkout_status.status == "expired":
             await db.payment_transactions.update_one(
@@ -881,6 +2489,7 @@ async def release_payment(release_req: PaymentReleaseRequest, user: dict = Depen
         {"id": release_req.job_id},
         {"$set": {"status": "completed"}}
     )
+    invalidate_job_lists()
     
     payout_doc = {
         "id": str(uuid.uuid4()),
@@ -911,32 +2520,471 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
     try:
         host_url = str(request.base_url).rstrip('/')
         webhook_url = f"{host_url}/api/webhook/stripe"
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+        stripe_checkout = get_stripe_checkout(webhook_url)
         
-        webhook_response = await stripe_checkout.handle_webhook(body, stripe_signature)
+        with track_external("stripe"):
+            webhook_response = await stripe_checkout.handle_webhook(body, stripe_signature)
         
         if webhook_response.payment_status == "paid":
             session_id = webhook_response.session_id
             transaction = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
             
             if transaction and transaction["payment_status"] != "paid":
-                await db.payment_transactions.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"payment_status": "paid", "status": "complete"}}
-                )
-                await db.jobs.update_one(
-                    {"id": transaction["job_id"]},
-                    {"$set": {"status": "in_escrow", "escrow_amount": transaction["amount"]}}
-                )
+                await mark_transaction_paid(transaction)
         
         return {"status": "ok"}
     except Exception as e:
         logger.error(f"Webhook error: {e}")
         return {"status": "error", "message": str(e)}
 
+# ============= File Serving =============
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=' range into (start, end) inclusive.
+    
+    Returns None to serve the whole file (no header, or multiple ranges) and
+    raises ValueError when the range can't be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header[6:].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = min(int(end_str), size - 1) if end_str else size - 1
+        else:
+            suffix = int(end_str)
+            if suffix == 0:
+                raise ValueError("empty suffix range")
+            start, end = max(size - suffix, 0), size - 1
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid range {range_header}")
+    if start >= size or start > end:
+        raise ValueError(f"range {range_header} outside {size} bytes")
+    return start, end
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that honours single byte-range requests and hands the file to the server when it can.
+    
+    Uses the ASGI zerocopysend/pathsend extensions when the server offers
+    them; otherwise streams fixed-size chunks so the file is never held in
+    memory.
+    """
+    
+    def __init__(self, path, range_header: Optional[str] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.range_header = range_header
+        self.headers["accept-ranges"] = "bytes"
+    
+    async def __call__(self, scope, receive, send):
+        if self.stat_result is None:
+            stat_result = await asyncio.to_thread(os.stat, self.path)
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.stat_result = stat_result
+            self.set_stat_headers(stat_result)
+        size = self.stat_result.st_size
+        
+        if_range = Headers(scope=scope).get("if-range")
+        byte_range = None
+        if if_range is None or if_range == self.headers.get("etag"):
+            try:
+                byte_range = parse_byte_range(self.range_header, size)
+            except ValueError:
+                await StarletteResponse(
+                    status_code=416, headers={"content-range": f"bytes */{size}"}
+                )(scope, receive, send)
+                return
+        
+        start, end = byte_range or (0, size - 1)
+        count = end - start + 1 if size else 0
+        if byte_range:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(count)
+        
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": start, "count": count})
+        elif "http.response.pathsend" in extensions and not byte_range:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            with open(self.path, "rb") as file:
+                file.seek(start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await asyncio.to_thread(file.read, min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+class ContentAddressedStaticFiles(StaticFiles):
+    """Serves files whose names are content hashes, so every response can be cached forever"""
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        etag = f'"{Path(full_path).stem}"'
+        response = RangeFileResponse(
+            full_path,
+            range_header=request_headers.get("range"),
+            status_code=status_code,
+            stat_result=stat_result,
+            headers={"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL}
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return StarletteResponse(status_code=304, headers={"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL})
+        return response
+
+# ============= Invoices =============
+
+cpu_pool: Optional[ProcessPoolExecutor] = None
+invoice_renders: Dict[str, asyncio.Future] = {}
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound work that would otherwise stall the event loop"""
+    global cpu_pool
+    if cpu_pool is None:
+        # Created lazily, once the loop and its threads are running: forking then could copy
+        # a lock some other thread holds, so workers come from a clean forkserver instead
+        cpu_pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return cpu_pool
+
+def render_invoice_pdf(invoice: dict, path: str):
+    """Draw an invoice to path. Runs in a worker process, so it only touches its arguments."""
+    pdf = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    
+    pdf.setFont("Helvetica-Bold", 20)
+    pdf.drawString(inch, height - inch, "Build Launch")
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(inch, height - 1.25 * inch, "Renovation Marketplace - Phone: 416-697-1728")
+    
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawRightString(width - inch, height - inch, invoice["title"])
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(width - inch, height - 1.25 * inch, f"Invoice #: {invoice['number']}")
+    pdf.drawRightString(width - inch, height - 1.45 * inch, f"Date: {invoice['date']}")
+    
+    y = height - 2.2 * inch
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(inch, y, "Bill To")
+    pdf.setFont("Helvetica", 10)
+    for line in invoice["bill_to"]:
+        y -= 0.2 * inch
+        pdf.drawString(inch, y, line)
+    
+    y -= 0.4 * inch
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(inch, y, "Job")
+    pdf.setFont("Helvetica", 10)
+    y -= 0.2 * inch
+    pdf.drawString(inch, y, f"{invoice['job_title']} ({invoice['job_location']})")
+    
+    y -= 0.5 * inch
+    pdf.setFont("Helvetica-Bold", 10)
+    pdf.drawString(inch, y, "Description")
+    pdf.drawRightString(width - inch, y, "Amount (CAD)")
+    pdf.line(inch, y - 0.08 * inch, width - inch, y - 0.08 * inch)
+    pdf.setFont("Helvetica", 10)
+    for description, amount in invoice["lines"]:
+        y -= 0.3 * inch
+        pdf.drawString(inch, y, description)
+        pdf.drawRightString(width - inch, y, f"${amount:,.2f}")
+    
+    y -= 0.2 * inch
+    pdf.line(inch, y, width - inch, y)
+    y -= 0.3 * inch
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(inch, y, invoice["total_label"])
+    pdf.drawRightString(width - inch, y, f"${invoice['total']:,.2f}")
+    
+    pdf.setFont("Helvetica", 8)
+    pdf.drawString(inch, 0.75 * inch, "Funds are held in escrow by Build Launch until the homeowner confirms completion.")
+    pdf.showPage()
+    pdf.save()
+
+def build_escrow_invoice(job: dict, transaction: dict, homeowner: dict) -> dict:
+    return {
+        "title": "ESCROW RECEIPT",
+        "number": f"ESC-{transaction['id'][:8].upper()}",
+        "date": transaction["created_at"][:10],
+        "bill_to": [homeowner["full_name"], homeowner["email"]],
+        "job_title": job["title"],
+        "job_location": job["location"],
+        "lines": [[f"Escrow deposit - {job['title']}", transaction["amount"]]],
+        "total_label": "Total Paid",
+        "total": transaction["amount"]
+    }
+
+def build_payout_invoice(job: dict, payout: dict, contractor: dict) -> dict:
+    return {
+        "title": "PAYOUT STATEMENT",
+        "number": f"PAY-{payout['id'][:8].upper()}",
+        "date": payout["released_at"][:10],
+        "bill_to": [contractor["full_name"], contractor["email"]],
+        "job_title": job["title"],
+        "job_location": job["location"],
+        "lines": [
+            ["Escrow released", payout["escrow_amount"]],
+            [f"Platform fee ({PLATFORM_FEE_PERCENT}%)", -payout["platform_fee"]]
+        ],
+        "total_label": "Contractor Payout",
+        "total": payout["contractor_payout"]
+    }
+
+async def get_invoice_file(kind: str, invoice: dict) -> Path:
+    """Return the cached PDF for this invoice content, rendering it off the event loop if needed"""
+    digest = hashlib.sha256(json.dumps(invoice, sort_keys=True).encode()).hexdigest()
+    path = INVOICE_DIR / f"{kind}-{digest}.pdf"
+    cached = path.exists()
+    record_cache("invoice_pdf", cached)
+    if cached:
+        return path
+    
+    # Concurrent downloads of the same invoice share one render
+    if digest not in invoice_renders:
+        async def render():
+            tmp_path = INVOICE_DIR / f".{digest}.{uuid.uuid4().hex}.tmp"
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(get_cpu_pool(), render_invoice_pdf, invoice, str(tmp_path))
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+                invoice_renders.pop(digest, None)
+        invoice_renders[digest] = asyncio.ensure_future(render())
+    await asyncio.shield(invoice_renders[digest])
+    return path
+
+@api_router.get("/payments/{job_id}/invoice")
+async def get_invoice(job_id: str, request: Request, kind: str = "escrow", user: dict = Depends(get_current_user)):
+    """Download the escrow receipt (homeowner) or payout statement (contractor) for a job"""
+    if kind not in ["escrow", "payout"]:
+        raise HTTPException(status_code=400, detail="Invoice kind must be escrow or payout")
+    
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    is_admin = user["user_type"] == "admin"
+    
+    if kind == "escrow":
+        if job["homeowner_id"] != user["id"] and not is_admin:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        transaction = await db.payment_transactions.find_one(
+            {"job_id": job_id, "payment_status": "paid"}, {"_id": 0}
+        )
+        if not transaction:
+            raise HTTPException(status_code=404, detail="No escrow payment for this job")
+        homeowner = await db.users.find_one({"id": job["homeowner_id"]}, {"_id": 0, "password_hash": 0})
+        invoice = build_escrow_invoice(job, transaction, homeowner)
+    else:
+        if user["id"] not in [job["homeowner_id"], job.get("awarded_contractor_id")] and not is_admin:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        payout = await db.payouts.find_one({"job_id": job_id}, {"_id": 0})
+        if not payout:
+            raise HTTPException(status_code=404, detail="Payment has not been released")
+        contractor = await db.users.find_one({"id": payout["contractor_id"]}, {"_id": 0, "password_hash": 0})
+        invoice = build_payout_invoice(job, payout, contractor)
+    
+    path = await get_invoice_file(kind, invoice)
+    etag = f'"{path.stem}"'
+    headers = {"etag": etag, "cache-control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return StarletteResponse(status_code=304, headers=headers)
+    return RangeFileResponse(
+        path,
+        range_header=request.headers.get("range"),
+        media_type="application/pdf",
+        filename=f"{invoice['number']}.pdf",
+        headers=headers
+    )
+
+# ============= Uploads =============
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Identify an image from its leading bytes rather than trusting the client's Content-Type"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+variant_tasks = set()
+
+def generate_image_variants(source_path: str, digest: str) -> Dict[str, str]:
+    """Write fixed-width WebP thumbnails and a compressed web copy next to the original.
+    
+    Runs in a worker process. Returns {variant name: filename}.
+    """
+    variants = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        targets = [(f"w{width}", width, 75) for width in THUMBNAIL_WIDTHS]
+        targets.append(("web", WEB_VARIANT_MAX_WIDTH, 80))
+        for name, width, quality in targets:
+            resized = image
+            if image.width > width:
+                resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            filename = f"{digest}_{name}.webp"
+            tmp_path = UPLOAD_DIR / f".{filename}.{os.getpid()}.tmp"
+            resized.save(tmp_path, "WEBP", quality=quality, method=4)
+            os.replace(tmp_path, UPLOAD_DIR / filename)
+            variants[name] = filename
+    return variants
+
+async def build_image_variants(digest: str, filename: str):
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(
+            get_cpu_pool(), generate_image_variants, str(UPLOAD_DIR / filename), digest
+        )
+    except Exception as e:
+        logger.error(f"Failed to build variants for upload {digest}: {e}")
+        return
+    await db.uploads.update_one({"id": digest}, {"$set": {"variants": variants}})
+
+def schedule_image_variants(digest: str, filename: str):
+    """Generate variants in the background; the upload response doesn't wait for them"""
+    task = asyncio.create_task(build_image_variants(digest, filename))
+    variant_tasks.add(task)
+    task.add_done_callback(variant_tasks.discard)
+
+async def attach_image_variants(jobs: List[dict], detail: bool = False):
+    """Add thumbnail URLs (list views) or every variant (detail view) for uploaded job images.
+    
+    Images that aren't our uploads, or whose variants aren't ready yet, fall
+    back to the original URL.
+    """
+    digests = {
+        match.group(1)
+        for job in jobs for url in job.get("images") or []
+        if (match := UPLOAD_NAME_RE.search(url))
+    }
+    variants_by_digest = {}
+    if digests:
+        uploads = await db.uploads.find(
+            {"id": {"$in": list(digests)}, "variants": {"$exists": True}},
+            {"_id": 0, "id": 1, "variants": 1}
+        ).to_list(len(digests))
+        variants_by_digest = {u["id"]: u["variants"] for u in uploads}
+    
+    for job in jobs:
+        image_variants = []
+        for url in job.get("images") or []:
+            match = UPLOAD_NAME_RE.search(url)
+            variants = variants_by_digest.get(match.group(1), {}) if match else {}
+            base = url[:url.rindex("/") + 1] if match else ""
+            entry = {"original": url}
+            for name in [f"w{width}" for width in THUMBNAIL_WIDTHS] + ["web"]:
+                entry[name] = base + variants[name] if name in variants else url
+            image_variants.append(entry)
+        if detail:
+            job["image_variants"] = image_variants
+        else:
+            job["thumbnails"] = [entry[f"w{THUMBNAIL_WIDTHS[0]}"] for entry in image_variants]
+
+@api_router.post("/uploads/images", dependencies=[route_rate_limit("upload_image")])
+async def upload_image(request: Request, user: dict = Depends(get_current_user)):
+    """Stream a raw image body to disk, naming it by its SHA-256 so repeat uploads are stored once.
+    
+    The body is read chunk by chunk: the size limit and type check apply while
+    streaming, and the file only appears in UPLOAD_DIR once it is complete. Disk
+    I/O runs in worker threads so a slow disk doesn't stall the event loop.
+    """
+    if user["user_type"] != "homeowner":
+        raise HTTPException(status_code=403, detail="Only homeowners can upload job photos")
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail="Photos must be JPEG, PNG or WebP")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Photo is too large")
+    
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    tmp_path = UPLOAD_DIR / f".upload-{uuid.uuid4().hex}.tmp"
+    try:
+        out = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Photo is too large")
+                if len(head) < 12:
+                    head += chunk[:12]
+                    if len(head) >= 12 and sniff_image_type(head) != content_type:
+                        raise HTTPException(status_code=415, detail="File content does not match its type")
+                hasher.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        if sniff_image_type(head) != content_type:
+            raise HTTPException(status_code=415, detail="File content does not match its type")
+        
+        digest = hasher.hexdigest()
+        filename = f"{digest}.{ALLOWED_IMAGE_TYPES[content_type]}"
+        final_path = UPLOAD_DIR / filename
+        deduplicated = await asyncio.to_thread(final_path.exists)
+        record_cache("upload_dedupe", deduplicated)
+        if not deduplicated:
+            await asyncio.to_thread(os.replace, tmp_path, final_path)
+    finally:
+        await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+    
+    upload = await db.uploads.find_one_and_update(
+        {"id": digest},
+        {
+            "$setOnInsert": {
+                "id": digest,
+                "filename": filename,
+                "content_type": content_type,
+                "size": size,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            },
+            "$addToSet": {"uploaded_by": user["id"]}
+        },
+        projection={"_id": 0, "variants": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if not upload.get("variants"):
+        schedule_image_variants(digest, filename)
+    
+    return {
+        "id": digest,
+        "url": f"/api/uploads/{filename}",
+        "size": size,
+        "content_type": content_type,
+        "deduplicated": deduplicated
+    }
+
 # ============= Messages Endpoints =============
 
-@api_router.post("/messages")
+def conversation_key(user_a: str, user_b: str) -> str:
+    """Order-independent key shared by every message between two users"""
+    return ":".join(sorted([user_a, user_b]))
+
+@api_router.post("/messages", dependencies=[route_rate_limit("send_message")])
 async def send_message(msg_data: MessageCreate, user: dict = Depends(get_current_user)):
     receiver = await db.users.find_one({"id": msg_data.receiver_id}, {"_id": 0})
     if not receiver:
@@ -948,12 +2996,18 @@ async def send_message(msg_data: MessageCreate, user: dict = Depends(get_current
         "sender_id": user["id"],
         "sender_name": user["full_name"],
         "receiver_id": msg_data.receiver_id,
+        "participants_key": conversation_key(user["id"], msg_data.receiver_id),
         "job_id": msg_data.job_id,
         "content": msg_data.content,
         "read": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.messages.insert_one(msg_doc)
+    await db.unread_counters.update_one(
+        {"user_id": msg_data.receiver_id, "other_user_id": user["id"]},
+        {"$inc": {"count": 1}},
+        upsert=True
+    )
     return {"id": msg_id, "message": "Message sent"}
 
 @api_router.get("/messages")
@@ -962,49 +3016,89 @@ async def get_messages(user: dict = Depends(get_current_user)):
         {"$or": [{"sender_id": user["id"]}, {"receiver_id": user["id"]}]},
         {"_id": 0}
     ).sort("created_at", -1).to_list(200)
-    return messages
+    return plain_json(messages)
 
-@api_router.get("/messages/conversations")
+@api_router.get("/messages/conversations", dependencies=[route_rate_limit("conversations")])
 async def get_conversations(user: dict = Depends(get_current_user)):
     messages = await db.messages.find(
         {"$or": [{"sender_id": user["id"]}, {"receiver_id": user["id"]}]},
         {"_id": 0}
     ).sort("created_at", -1).to_list(1000)
     
-    conversations = {}
+    counters = await db.unread_counters.find(
+        {"user_id": user["id"], "count": {"$gt": 0}},
+        {"_id": 0, "other_user_id": 1, "count": 1}
+    ).to_list(1000)
+    unread_by_user = {c["other_user_id"]: c["count"] for c in counters}
+    
+    latest = {}
     for msg in messages:
         other_id = msg["receiver_id"] if msg["sender_id"] == user["id"] else msg["sender_id"]
-        if other_id not in conversations:
-            other_user = await db.users.find_one({"id": other_id}, {"_id": 0, "password_hash": 0})
-            conversations[other_id] = {
-                "user_id": other_id,
-                "user_name": other_user["full_name"] if other_user else "Unknown",
-                "user_type": other_user["user_type"] if other_user else "unknown",
-                "last_message": msg["content"],
-                "last_message_time": msg["created_at"],
-                "unread_count": 0
-            }
-        if msg["receiver_id"] == user["id"] and not msg["read"]:
-            conversations[other_id]["unread_count"] += 1
-    
-    return list(conversations.values())
+        latest.setdefault(other_id, msg)
+    other_users = await loader("users", ("full_name", "user_type")).load_many(latest)
+    
+    return [
+        {
+            "user_id": other_id,
+            "user_name": other_user["full_name"] if other_user else "Unknown",
+            "user_type": other_user["user_type"] if other_user else "unknown",
+            "last_message": msg["content"],
+            "last_message_time": msg["created_at"],
+            "unread_count": unread_by_user.get(other_id, 0)
+        }
+        for (other_id, msg), other_user in zip(latest.items(), other_users)
+    ]
+
+@api_router.get("/messages/unread-count")
+async def get_unread_count(user: dict = Depends(get_current_user)):
+    """Total unread messages for the navbar badge, summed from per-conversation counters"""
+    result = await db.unread_counters.aggregate([
+        {"$match": {"user_id": user["id"], "count": {"$gt": 0}}},
+        {"$group": {"_id": None, "total": {"$sum": "$count"}}}
+    ]).to_list(1)
+    return {"unread_count": result[0]["total"] if result else 0}
 
 @api_router.get("/messages/{other_user_id}")
-async def get_conversation_messages(other_user_id: str, user: dict = Depends(get_current_user)):
-    messages = await db.messages.find(
-        {"$or": [
-            {"sender_id": user["id"], "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": user["id"]}
-        ]},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(200)
-    
-    await db.messages.update_many(
-        {"sender_id": other_user_id, "receiver_id": user["id"], "read": False},
-        {"$set": {"read": True}}
+async def get_conversation_messages(
+    other_user_id: str,
+    before: Optional[str] = None,
+    before_id: Optional[str] = None,
+    limit: int = MESSAGE_PAGE_SIZE,
+    user: dict = Depends(get_current_user)
+):
+    """Newest page of a conversation first; pass next_before and next_before_id back as
+    before= and before_id= to load older messages"""
+    limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+    query = {"participants_key": conversation_key(user["id"], other_user_id)}
+    if before and before_id:
+        # id breaks created_at ties, so messages sharing a timestamp across pages aren't skipped
+        query["$or"] = [{"created_at": {"$lt": before}}, {"created_at": before, "id": {"$lt": before_id}}]
+    elif before:
+        query["created_at"] = {"$lt": before}
+    
+    # Fetch one extra row to know whether an older page exists
+    page = await db.messages.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    has_more = len(page) > limit
+    messages = page[:limit]
+    messages.reverse()
+    
+    # Only touch the messages when the counter says something is unread
+    counter = await db.unread_counters.find_one_and_update(
+        {"user_id": user["id"], "other_user_id": other_user_id, "count": {"$gt": 0}},
+        {"$set": {"count": 0}}
     )
-    
-    return messages
+    if counter:
+        await db.messages.update_many(
+            {"sender_id": other_user_id, "receiver_id": user["id"], "read": False},
+            {"$set": {"read": True}}
+        )
+    
+    return plain_json({
+        "messages": messages,
+        "has_more": has_more,
+        "next_before": messages[0]["created_at"] if has_more else None,
+        "next_before_id": messages[0]["id"] if has_more else None
+    })
 
 # ============= Reviews Endpoints =============
 
@@ -1052,18 +3146,22 @@ async def get_contractor_reviews(contractor_id: str):
 
 # ============= Stats Endpoints =============
 
-@api_router.get("/stats/dashboard")
-async def get_dashboard_stats(user: dict = Depends(get_current_user)):
+async def aggregate_total(collection, match: dict, field: str) -> float:
+    result = await collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "total": {"$sum": f"${field}"}}}
+    ]).to_list(1)
+    return result[0]["total"] if result else 0
+
+async def load_dashboard_stats(user: dict) -> dict:
+    """Headline numbers for a dashboard; the counts are independent so they run concurrently"""
     if user["user_type"] == "homeowner":
-        total_jobs = await db.jobs.count_documents({"homeowner_id": user["id"]})
-        active_jobs = await db.jobs.count_documents({"homeowner_id": user["id"], "status": {"$in": ["open", "in_escrow", "awarded"]}})
-        completed_jobs = await db.jobs.count_documents({"homeowner_id": user["id"], "status": "completed"})
-        total_spent_pipeline = [
-            {"$match": {"homeowner_id": user["id"], "status": "completed"}},
-            {"$group": {"_id": None, "total": {"$sum": "$escrow_amount"}}}
-        ]
-        total_spent_result = await db.jobs.aggregate(total_spent_pipeline).to_list(1)
-        total_spent = total_spent_result[0]["total"] if total_spent_result else 0
+        total_jobs, active_jobs, completed_jobs, total_spent = await asyncio.gather(
+            db.jobs.count_documents({"homeowner_id": user["id"]}),
+            db.jobs.count_documents({"homeowner_id": user["id"], "status": {"$in": ["open", "in_escrow", "awarded"]}}),
+            db.jobs.count_documents({"homeowner_id": user["id"], "status": "completed"}),
+            aggregate_total(db.jobs, {"homeowner_id": user["id"], "status": "completed"}, "escrow_amount")
+        )
         
         return {
             "total_jobs": total_jobs,
@@ -1072,18 +3170,13 @@ async def get_dashboard_stats(user: dict = Depends(get_current_user)):
             "total_spent": total_spent
         }
     else:
-        total_bids = await db.bids.count_documents({"contractor_id": user["id"]})
-        accepted_bids = await db.bids.count_documents({"contractor_id": user["id"], "status": "accepted"})
-        jobs_completed = await db.jobs.count_documents({"awarded_contractor_id": user["id"], "status": "completed"})
-        
-        earnings_pipeline = [
-            {"$match": {"contractor_id": user["id"], "status": "released"}},
-            {"$group": {"_id": None, "total": {"$sum": "$contractor_payout"}}}
-        ]
-        earnings_result = await db.payouts.aggregate(earnings_pipeline).to_list(1)
-        total_earnings = earnings_result[0]["total"] if earnings_result else 0
-        
-        reviews_data = await get_contractor_reviews(user["id"])
+        total_bids, accepted_bids, jobs_completed, total_earnings, reviews_data = await asyncio.gather(
+            db.bids.count_documents({"contractor_id": user["id"]}),
+            db.bids.count_documents({"contractor_id": user["id"], "status": "accepted"}),
+            db.jobs.count_documents({"awarded_contractor_id": user["id"], "status": "completed"}),
+            aggregate_total(db.payouts, {"contractor_id": user["id"], "status": "released"}, "contractor_payout"),
+            get_contractor_reviews(user["id"])
+        )
         
         return {
             "total_bids": total_bids,
@@ -1094,6 +3187,29 @@ async def get_dashboard_stats(user: dict = Depends(get_current_user)):
             "total_reviews": reviews_data["total_reviews"]
         }
 
+@api_router.get("/stats/dashboard")
+async def get_dashboard_stats(user: dict = Depends(get_current_user)):
+    return await load_dashboard_stats(user)
+
+@api_router.get("/dashboard")
+async def get_dashboard(user: dict = Depends(get_current_user)):
+    """Everything a dashboard page renders, in one round trip.
+    Homeowners get their stats and jobs; contractors get stats, open job cards and their bids.
+    The user is resolved once, the sections are queried concurrently and the open job
+    cards come from the same cache as /jobs."""
+    if user["user_type"] == "homeowner":
+        stats, jobs = await asyncio.gather(load_dashboard_stats(user), load_my_jobs(user))
+        return plain_json({"stats": stats, "jobs": jobs})
+    
+    stats, jobs, bids = await asyncio.gather(
+        load_dashboard_stats(user),
+        job_list_payload(),
+        load_my_bids(user, set(BID_CARD_FIELDS))
+    )
+    # The job cards are already serialized in job_list_cache; splice them in as they are
+    body = b'{"stats":' + orjson.dumps(stats) + b',"jobs":' + jobs.body + b',"bids":' + orjson.dumps(bids) + b"}"
+    return StarletteResponse(content=body, media_type="application/json")
+
 @api_router.get("/contractors/{contractor_id}")
 async def get_contractor_profile(contractor_id: str):
     contractor = await db.users.find_one({"id": contractor_id, "user_type": "contractor"}, {"_id": 0, "password_hash": 0})
@@ -1131,17 +3247,21 @@ JOB_CATEGORIES = [
 
 LOCATIONS = ["Mississauga", "Toronto", "Brampton"]
 
+# Static, so serialized (and compressed, when large enough) once at startup
+categories_payload = CachedPayload({"categories": JOB_CATEGORIES})
+locations_payload = CachedPayload({"locations": LOCATIONS})
+
 @api_router.get("/categories")
-async def get_categories():
-    return {"categories": JOB_CATEGORIES}
+async def get_categories(request: Request):
+    return categories_payload.response(request)
 
 @api_router.get("/locations")
-async def get_locations():
-    return {"locations": LOCATIONS}
+async def get_locations(request: Request):
+    return locations_payload.response(request)
 
 # ============= Admin Endpoints =============
 
-@api_router.get("/admin/stats")
+@api_router.get("/admin/stats", dependencies=[route_rate_limit("admin_stats")])
 async def get_admin_stats(admin: dict = Depends(get_admin_user)):
     """Get platform-wide statistics for admin dashboard"""
     total_users = await db.users.count_documents({"user_type": {"$ne": "admin"}})
@@ -1198,34 +3318,46 @@ async def get_all_users(
     admin: dict = Depends(get_admin_user),
     user_type: Optional[str] = None,
     limit: int = 50,
-    skip: int = 0
+    skip: int = 0,
+    fields: Optional[str] = None,
+    view: str = "card"
 ):
     """Get all users with filtering"""
+    selected = select_fields(fields, view, USER_FIELDS, USER_CARD_FIELDS)
     query = {"user_type": {"$ne": "admin"}}
     if user_type:
         query["user_type"] = user_type
     
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0}).skip(skip).limit(limit).to_list(limit)
+    projection = mongo_projection(selected, USER_FIELDS, full={"_id": 0, "password_hash": 0})
+    users = await db.users.find(query, projection).skip(skip).limit(limit).to_list(limit)
     total = await db.users.count_documents(query)
     
-    return {"users": users, "total": total}
+    return plain_json({"users": users, "total": total})
 
 @api_router.get("/admin/jobs")
 async def get_all_jobs(
     admin: dict = Depends(get_admin_user),
     status: Optional[str] = None,
     limit: int = 50,
-    skip: int = 0
+    skip: int = 0,
+    fields: Optional[str] = None,
+    view: str = "card"
 ):
     """Get all jobs with filtering"""
+    selected = select_fields(fields, view, JOB_FIELDS, ADMIN_JOB_CARD_FIELDS)
     query = {}
     if status:
         query["status"] = status
     
-    jobs = await db.jobs.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    projection = mongo_projection(selected, JOB_FIELDS)
+    jobs = await db.jobs.find(query, projection).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    if selected is not None and "bid_count" in selected and jobs:
+        bid_counts = await count_bids([job["id"] for job in jobs])
+        for job in jobs:
+            job["bid_count"] = bid_counts[job["id"]]
     total = await db.jobs.count_documents(query)
     
-    return {"jobs": jobs, "total": total}
+    return plain_json({"jobs": jobs, "total": total})
 
 @api_router.get("/admin/payments")
 async def get_all_payments(
@@ -1237,7 +3369,117 @@ async def get_all_payments(
     transactions = await db.payment_transactions.find({}, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     payouts = await db.payouts.find({}, {"_id": 0}).sort("released_at", -1).skip(skip).limit(limit).to_list(limit)
     
-    return {"transactions": transactions, "payouts": payouts}
+    return plain_json({"transactions": transactions, "payouts": payouts})
+
+# ============= Admin Exports =============
+
+EXPORT_BATCH_SIZE = 500  # documents per cursor round trip
+EXPORT_FLUSH_BYTES = 64 * 1024  # rows are buffered up to this much before each chunk is sent
+# dataset -> (collection, sort field, columns); columns double as the projection
+EXPORT_DATASETS = {
+    "users": ("users", "created_at", [
+        "id", "email", "full_name", "user_type", "phone", "verified", "suspended", "created_at"
+    ]),
+    "jobs": ("jobs", "created_at", [
+        "id", "title", "category", "location", "status", "budget_min", "budget_max", "escrow_amount",
+        "homeowner_id", "homeowner_name", "awarded_contractor_id", "created_at"
+    ]),
+    "payments": ("payment_transactions", "created_at", [
+        "id", "session_id", "job_id", "user_id", "amount", "currency", "payment_type", "payment_status",
+        "status", "created_at"
+    ]),
+    "payouts": ("payouts", "released_at", [
+        "id", "job_id", "contractor_id", "escrow_amount", "platform_fee", "contractor_payout", "status",
+        "released_at"
+    ]),
+}
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+def csv_cell(value) -> str:
+    """Flatten a value for CSV. Leading =+-@ is escaped so spreadsheets don't run user text as a formula."""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        value = orjson.dumps(value).decode()
+    value = str(value)
+    if value[:1] in ("=", "+", "-", "@") and not re.fullmatch(r"-?\d+(\.\d+)?", value):
+        return "'" + value
+    return value
+
+async def export_chunks(cursor, columns: List[str], fmt: str):
+    """Yields the export in ~EXPORT_FLUSH_BYTES chunks; memory stays bounded by one cursor batch"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for doc in cursor:
+            writer.writerow([csv_cell(doc.get(column)) for column in columns])
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+    else:
+        chunk = bytearray()
+        async for doc in cursor:
+            chunk += orjson.dumps({column: doc.get(column) for column in columns})
+            chunk += b"\n"
+            if len(chunk) >= EXPORT_FLUSH_BYTES:
+                yield bytes(chunk)
+                chunk.clear()
+        yield bytes(chunk)
+
+@api_router.get("/admin/export/{dataset}", dependencies=[route_rate_limit("admin_export")])
+async def export_admin_data(
+    dataset: str,
+    format: str = "csv",
+    user_type: Optional[str] = None,
+    status: Optional[str] = None,
+    admin: dict = Depends(get_admin_user)
+):
+    """Stream a full users/jobs/payments/payouts report as CSV or NDJSON, with the admin list filters"""
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export. Available: {', '.join(EXPORT_DATASETS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    
+    collection, sort_field, columns = EXPORT_DATASETS[dataset]
+    query = {}
+    if dataset == "users":
+        query["user_type"] = user_type or {"$ne": "admin"}
+    elif dataset == "jobs" and status:
+        query["status"] = status
+    
+    cursor = db[collection].find(
+        query,
+        {"_id": 0, **{column: 1 for column in columns}},
+        batch_size=EXPORT_BATCH_SIZE,
+        allow_disk_use=True
+    ).sort(sort_field, -1)
+    filename = f"buildlaunch-{dataset}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.{format}"
+    logger.info(f"Admin {admin['email']} exporting {dataset} as {format}")
+    return StreamingResponse(
+        export_chunks(cursor, columns, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/db-stats")
+async def get_db_stats(admin: dict = Depends(get_admin_user)):
+    """Per-route Mongo query counts and DB time since this worker started"""
+    return {
+        "budget": DB_QUERY_BUDGET,
+        "routes": [
+            {
+                "route": route,
+                "requests": totals["requests"],
+                "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                "max_queries": totals["max_queries"],
+                "avg_db_ms": round(totals["db_ms"] / totals["requests"], 2)
+            }
+            for route, totals in sorted(route_db_stats.items(), key=lambda item: -item[1]["queries"])
+        ]
+    }
 
 @api_router.put("/admin/users/{user_id}/verify")
 async def admin_verify_contractor(user_id: str, admin: dict = Depends(get_admin_user)):
@@ -1282,6 +3524,7 @@ async def admin_delete_job(job_id: str, admin: dict = Depends(get_admin_user)):
     
     await db.jobs.delete_one({"id": job_id})
     await db.bids.delete_many({"job_id": job_id})
+    invalidate_job_lists()
     logger.info(f"Admin deleted job: {job_id}")
     return {"message": "Job deleted successfully"}
 
@@ -1312,19 +3555,127 @@ async def admin_resolve_dispute(job_id: str, resolution: dict, admin: dict = Dep
         }
         await db.payouts.insert_one(payout_doc)
         await db.jobs.update_one({"id": job_id}, {"$set": {"status": "completed"}})
+        invalidate_job_lists()
         logger.info(f"Admin resolved dispute - released to contractor: {job_id}")
         return {"message": "Payment released to contractor", "payout": contractor_payout}
     
     elif action == "refund_to_homeowner":
         await db.jobs.update_one({"id": job_id}, {"$set": {"status": "cancelled", "escrow_amount": 0}})
+        invalidate_job_lists()
         logger.info(f"Admin resolved dispute - refunded to homeowner: {job_id}")
         return {"message": "Refund initiated for homeowner"}
     
     raise HTTPException(status_code=400, detail="Invalid resolution action")
 
+# ============= Batch Requests =============
+
+# Read-only routes a client may combine; anything else is rejected up front
+BATCHABLE_ROUTES = {
+    "/api/auth/me",
+    "/api/jobs",
+    "/api/jobs/my-jobs",
+    "/api/jobs/{job_id}",
+    "/api/jobs/{job_id}/bids",
+    "/api/bids/my-bids",
+    "/api/contractors/{contractor_id}",
+    "/api/reviews/contractor/{contractor_id}",
+    "/api/stats/dashboard",
+    "/api/dashboard",
+    "/api/messages/conversations",
+    "/api/messages/unread-count",
+    "/api/categories",
+    "/api/locations",
+}
+# Describe the batch body or its encoding, not the sub-requests
+BATCH_DROPPED_HEADERS = {b"content-length", b"content-type", b"accept-encoding", b"if-none-match"}
+
+def resolve_batch_route(request: Request, path: str):
+    """Route and ASGI scope for a whitelisted GET sub-request, matched the way the router would"""
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": request.scope["asgi"],
+        "http_version": request.scope["http_version"],
+        "method": "GET",
+        "scheme": request.scope["scheme"],
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k not in BATCH_DROPPED_HEADERS],
+        "app": request.app,
+    }
+    if "starlette.exception_handlers" in request.scope:
+        scope["starlette.exception_handlers"] = request.scope["starlette.exception_handlers"]
+    for route in request.app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            if getattr(route, "path", None) in BATCHABLE_ROUTES:
+                return route, {**scope, **child_scope}
+            break
+    raise HTTPException(status_code=400, detail=f"{url.path} cannot be batched")
+
+async def run_batch_item(route, scope: dict) -> tuple:
+    """Run one sub-request through its route (exception handlers included, middleware not)"""
+    status, chunks = 500, []
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    try:
+        await route.handle(scope, receive, send)
+    except Exception:
+        logger.exception(f"Batch sub-request failed: {scope['path']}")
+        return 500, {"detail": "Internal Server Error"}
+    body = b"".join(chunks)
+    try:
+        return status, orjson.loads(body) if body else None
+    except orjson.JSONDecodeError:
+        return status, body.decode(errors="replace")
+
+@api_router.post("/batch")
+async def batch(payload: BatchRequest, request: Request):
+    """Several GETs in one round trip. Sub-requests run concurrently with the caller's
+    headers, each with its own status, and share the batch's loaders."""
+    resolved = [resolve_batch_route(request, item.path) for item in payload.requests]
+    results = await asyncio.gather(*(run_batch_item(route, scope) for route, scope in resolved))
+    
+    return plain_json({"responses": [
+        {"id": item.id if item.id is not None else str(index), "status": status, "body": body}
+        for index, (item, (status, body)) in enumerate(zip(payload.requests, results))
+    ]})
+
 # Include router
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text exposition of this worker's metrics"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Uploaded photos and their variants are public and named by content hash
+app.mount("/api/uploads", ContentAddressedStaticFiles(directory=UPLOAD_DIR), name="uploads")
+
+if LOOP_BLOCK_STRICT_MS:
+    app.add_middleware(LoopBlockStrictMiddleware, watchdog=loop_watchdog, limit_ms=LOOP_BLOCK_STRICT_MS)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(RequestCacheMiddleware)
+app.add_middleware(DbQueryStatsMiddleware, budget=DB_QUERY_BUDGET)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(LoadSheddingMiddleware, max_in_flight=MAX_IN_FLIGHT_REQUESTS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1333,6 +3684,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_db_client():
+    await db.unread_counters.create_index([("user_id", 1), ("other_user_id", 1)], unique=True)
+    await db.messages.create_index([("receiver_id", 1), ("sender_id", 1), ("read", 1)])
+    await db.messages.create_index([("participants_key", 1), ("created_at", -1), ("id", -1)])
+    await db.notification_events.create_index("recipient_id")
+    await db.notification_events.create_index("created_at")
+    await db.notification_events.create_index("claimed_by")
+    await db.uploads.create_index("id", unique=True)
+    await db.idempotency_keys.create_index([("user_id", 1), ("key", 1)], unique=True)
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+    await db.payment_transactions.create_index([("job_id", 1), ("user_id", 1), ("payment_status", 1)])
+    await db.payment_transactions.create_index([("payment_status", 1), ("expires_at", 1)])
+    await db.payment_transactions.create_index("reconcile_run", sparse=True)
+    await db.task_leases.create_index("name", unique=True)
+    if RATE_LIMIT_BACKEND == "mongo":
+        await db.rate_limits.create_index([("key", 1), ("window", 1)], unique=True)
+        await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Backfill the conversation key on messages written before it existed
+    await db.messages.update_many(
+        {"participants_key": {"$exists": False}},
+        [{"$set": {"participants_key": {"$cond": [
+            {"$lt": ["$sender_id", "$receiver_id"]},
+            {"$concat": ["$sender_id", ":", "$receiver_id"]},
+            {"$concat": ["$receiver_id", ":", "$sender_id"]}
+        ]}}}]
+    )
+    
+    # Seed counters from existing unread messages the first time this runs
+    if not await db.unread_counters.find_one({}):
+        await db.messages.aggregate([
+            {"$match": {"read": False}},
+            {"$group": {"_id": {"user_id": "$receiver_id", "other_user_id": "$sender_id"}, "count": {"$sum": 1}}},
+            {"$project": {"_id": 0, "user_id": "$_id.user_id", "other_user_id": "$_id.other_user_id", "count": 1}},
+            {"$merge": {"into": "unread_counters", "on": ["user_id", "other_user_id"], "whenMatched": "replace"}}
+        ]).to_list(None)
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks.append(asyncio.create_task(run_digest_scheduler()))
+    background_tasks.append(asyncio.create_task(run_payment_reconciler()))
+    background_tasks.append(loop_watchdog.start())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+
+@app.on_event("startup")
+async def start_sms_dispatcher():
+    if sms_dispatcher:
+        sms_dispatcher.start()
+
+@app.on_event("shutdown")
+async def stop_sms_dispatcher():
+    if sms_dispatcher:
+        await sms_dispatcher.stop()
+
+@app.on_event("shutdown")
+async def shutdown_cpu_pool():
+    if cpu_pool:
+        cpu_pool.shutdown(wait=False)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
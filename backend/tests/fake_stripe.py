@@ -0,0 +1,44 @@
+"""
+Minimal in-process stand-in for emergentintegrations' StripeCheckout.
+
+Install it with `server.stripe_checkout_factory = FakeStripeCheckout`.
+Checkout sessions are "paid" as soon as their status is checked, unless listed
+in `open_sessions` (the customer hasn't paid yet); unknown ones are expired.
+Every call sleeps for `latency` seconds to model the round trip to Stripe.
+"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+
+class FakeStripeCheckout:
+    sessions = {}  # session_id -> checkout request, shared by every instance
+    open_sessions = set()
+    latency = 0.15
+
+    def __init__(self, api_key=None, webhook_url=None):
+        self.webhook_url = webhook_url
+
+    async def create_checkout_session(self, checkout_request):
+        await asyncio.sleep(self.latency)
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        self.sessions[session_id] = checkout_request
+        return SimpleNamespace(session_id=session_id, url=f"https://checkout.stripe.test/pay/{session_id}")
+
+    async def get_checkout_status(self, session_id):
+        await asyncio.sleep(self.latency)
+        if session_id in self.open_sessions:
+            return SimpleNamespace(status="open", payment_status="unpaid", amount_total=0, currency="cad", metadata={})
+        request = self.sessions.get(session_id)
+        if request is None:
+            return SimpleNamespace(status="expired", payment_status="unpaid", amount_total=0, currency="cad", metadata={})
+        return SimpleNamespace(
+            status="complete",
+            payment_status="paid",
+            amount_total=int(request.amount * 100),
+            currency=request.currency,
+            metadata=request.metadata
+        )
+
+    async def handle_webhook(self, body, signature):
+        raise ValueError("FakeStripeCheckout does not receive webhooks; poll /payments/status instead")
@@ -0,0 +1,74 @@
+"""
+Minimal local stand-in for the Twilio Messages API.
+
+Point the backend at it with TWILIO_API_BASE_URL=http://127.0.0.1:<port>.
+Every accepted message is recorded on `server.messages`; set `fail_next`
+to answer the next N requests with 429 to exercise retries.
+"""
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            self._reply(429, {"code": 20429, "message": "Too Many Requests", "status": 429})
+            return
+        
+        message = {
+            "sid": f"SM{uuid.uuid4().hex}",
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "body": form.get("Body"),
+            "status": "queued",
+        }
+        self.server.messages.append(message)
+        self._reply(201, message)
+    
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTwilioServer:
+    """Runs the fake API on a background thread; use as a context manager"""
+    
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), FakeTwilioHandler)
+        self.httpd.messages = []
+        self.httpd.fail_next = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+    
+    @property
+    def messages(self):
+        return self.httpd.messages
+    
+    def fail_next(self, count):
+        self.httpd.fail_next = count
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -5,6 +5,8 @@ Tests: Auth, Jobs, Bids, Contractors, Admin, Categories/Locations
 import pytest
 import requests
 import os
+import json
+import time
 import uuid
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
@@ -48,6 +50,35 @@ class TestHealthAndBasics:
         data = response.json()
         assert isinstance(data, list)
         print(f"✓ Jobs list endpoint working - {len(data)} jobs")
+    
+    def test_response_compression(self):
+        """Test large JSON is compressed and small JSON is sent as-is"""
+        response = requests.get(f"{BASE_URL}/api/jobs?view=full", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        if len(response.content) >= 1024:
+            assert response.headers.get("Content-Encoding") == "gzip"
+        assert "Accept-Encoding" in response.headers.get("Vary", "")
+        
+        response = requests.get(f"{BASE_URL}/api/categories", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+        assert response.headers.get("Vary", "").lower().count("accept-encoding") == 1
+        assert "Kitchen Renovation" in response.json()["categories"]
+        print("✓ Response compression working")
+    
+    def test_metrics_endpoint(self):
+        """Test /metrics exposes Prometheus text with per-route latency histograms"""
+        requests.get(f"{BASE_URL}/api/categories")
+        response = requests.get(f"{BASE_URL}/metrics")
+        if response.status_code == 401:
+            pytest.skip("METRICS_TOKEN is configured on this deployment")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        body = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in body
+        assert 'route="/api/categories"' in body
+        assert "event_loop_lag_seconds" in body
+        print("✓ Metrics endpoint working")
 
 
 class TestUserRegistration:
@@ -153,6 +184,37 @@ class TestUserLogin:
         assert response.status_code == 401
         print("✓ Invalid credentials correctly rejected")
     
+    def test_login_rate_limited_after_failures(self):
+        """Test repeated failures for one email are throttled with Retry-After"""
+        email = f"test_ratelimit_{uuid.uuid4().hex[:8]}@test.com"
+        for _ in range(5):
+            response = requests.post(f"{BASE_URL}/api/auth/login", json={
+                "email": email,
+                "password": "wrongpassword1"
+            })
+            assert response.status_code == 401
+        
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "wrongpassword1"
+        })
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        print("✓ Login rate limiting working")
+    
+    def test_login_does_not_block_event_loop(self):
+        """Test bcrypt runs off the event loop (needs LOOP_BLOCK_STRICT_MS on the server)"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "nonexistent@test.com",
+            "password": "wrongpassword"
+        })
+        blocked_ms = response.headers.get("X-Loop-Blocked-Ms")
+        if blocked_ms is None:
+            pytest.skip("LOOP_BLOCK_STRICT_MS is not enabled on this server")
+        assert response.status_code == 401, response.text
+        assert float(blocked_ms) < 50
+        print(f"✓ Login kept the event loop free ({blocked_ms} ms blocked)")
+    
     def test_admin_login(self):
         """Test admin login"""
         response = requests.post(f"{BASE_URL}/api/auth/admin-login", json={
@@ -246,6 +308,67 @@ class TestAuthenticatedEndpoints:
         assert "total_bids" in data
         assert "total_earnings" in data
         print("✓ Contractor dashboard stats working")
+    
+    def test_combined_dashboard(self, homeowner_token, contractor_token):
+        """Test one-call dashboard matches the endpoints it replaces"""
+        homeowner = {"Authorization": f"Bearer {homeowner_token}"}
+        response = requests.get(f"{BASE_URL}/api/dashboard", headers=homeowner)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["stats"] == requests.get(f"{BASE_URL}/api/stats/dashboard", headers=homeowner).json()
+        my_jobs = requests.get(f"{BASE_URL}/api/jobs/my-jobs", headers=homeowner).json()
+        assert [job["id"] for job in data["jobs"]] == [job["id"] for job in my_jobs]
+    
+        contractor = {"Authorization": f"Bearer {contractor_token}"}
+        response = requests.get(f"{BASE_URL}/api/dashboard", headers=contractor)
+        assert response.status_code == 200
+        data = response.json()
+        assert "total_bids" in data["stats"]
+        open_jobs = requests.get(f"{BASE_URL}/api/jobs").json()
+        assert [job["id"] for job in data["jobs"]] == [job["id"] for job in open_jobs]
+        my_bids = requests.get(f"{BASE_URL}/api/bids/my-bids", headers=contractor).json()
+        assert [bid["id"] for bid in data["bids"]] == [bid["id"] for bid in my_bids]
+        print("✓ Combined dashboard working")
+    
+    def test_batch_requests(self, homeowner_token):
+        """Test several GETs in one call, each with its own status"""
+        headers = {"Authorization": f"Bearer {homeowner_token}"}
+        response = requests.post(f"{BASE_URL}/api/batch", headers=headers, json={"requests": [
+            {"id": "me", "path": "/api/auth/me"},
+            {"id": "jobs", "path": "/api/jobs?view=full"},
+            {"id": "missing", "path": f"/api/jobs/{uuid.uuid4()}"}
+        ]})
+        assert response.status_code == 200
+        parts = {part["id"]: part for part in response.json()["responses"]}
+        assert parts["me"]["status"] == 200
+        assert parts["me"]["body"]["user_type"] == "homeowner"
+        assert parts["jobs"]["status"] == 200
+        assert isinstance(parts["jobs"]["body"], list)
+        assert parts["missing"]["status"] == 404
+    
+        # Only whitelisted read routes can be batched
+        response = requests.post(f"{BASE_URL}/api/batch", headers=headers, json={"requests": [
+            {"path": "/api/admin/users"}
+        ]})
+        assert response.status_code == 400
+        print("✓ Batch requests working")
+    
+    def test_notification_preferences(self, homeowner_token):
+        """Test switching bid emails to digest mode"""
+        headers = {"Authorization": f"Bearer {homeowner_token}"}
+        response = requests.put(f"{BASE_URL}/api/auth/notification-preferences",
+            headers=headers, json={"email_frequency": "digest"}
+        )
+        assert response.status_code == 200
+        
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers=headers).json()
+        assert me["notification_preferences"]["email_frequency"] == "digest"
+        
+        response = requests.put(f"{BASE_URL}/api/auth/notification-preferences",
+            headers=headers, json={"email_frequency": "hourly"}
+        )
+        assert response.status_code == 422
+        print("✓ Notification preferences working")
 
 
 class TestJobsCRUD:
@@ -292,6 +415,29 @@ class TestJobsCRUD:
         print(f"✓ Job created successfully - ID: {data['id']}")
         return data["id"]
     
+    def test_create_job_idempotency_key(self, homeowner_token):
+        """Test a retried create with the same Idempotency-Key returns the first job"""
+        headers = {"Authorization": f"Bearer {homeowner_token}", "Idempotency-Key": str(uuid.uuid4())}
+        job = {
+            "title": "TEST_Idempotent Job",
+            "description": "Posted twice by a client retry",
+            "location": "Toronto",
+            "category": "Painting",
+            "budget_min": 1000,
+            "budget_max": 2000
+        }
+        first = requests.post(f"{BASE_URL}/api/jobs", headers=headers, json=job)
+        assert first.status_code == 200
+        retry = requests.post(f"{BASE_URL}/api/jobs", headers=headers, json=job)
+        assert retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+        assert retry.headers.get("Idempotent-Replayed") == "true"
+    
+        # Same key with a different body is a client bug, not a retry
+        response = requests.post(f"{BASE_URL}/api/jobs", headers=headers, json={**job, "budget_max": 3000})
+        assert response.status_code == 422
+        print("✓ Idempotency-Key replay working")
+    
     def test_get_job(self, homeowner_token):
         """Test get single job"""
         # Create job first
@@ -315,6 +461,10 @@ class TestJobsCRUD:
         assert data["id"] == job_id
         assert data["title"] == "TEST_Get Job Test"
         print("✓ Get job endpoint working")
+        
+        # Job detail is a fixed handful of lookups, not one per anything
+        assert int(response.headers["X-DB-Query-Count"]) <= 3
+        assert "X-DB-Time-Ms" in response.headers
     
     def test_get_my_jobs(self, homeowner_token):
         """Test get my jobs"""
@@ -323,6 +473,8 @@ class TestJobsCRUD:
         )
         assert response.status_code == 200
         assert isinstance(response.json(), list)
+        # User, jobs, one bid-count aggregate and image variants, however many jobs there are
+        assert int(response.headers["X-DB-Query-Count"]) <= 4
         print("✓ Get my jobs endpoint working")
     
     def test_contractor_cannot_create_job(self, contractor_token):
@@ -358,6 +510,27 @@ class TestJobsCRUD:
         for job in data:
             assert job["category"] == "Kitchen Renovation"
         print(f"✓ Category filter working - {len(data)} Kitchen Renovation jobs")
+    
+    def test_jobs_card_view_and_fields(self):
+        """Test jobs list defaults to compact cards and honours ?fields= / ?view=full"""
+        cards = requests.get(f"{BASE_URL}/api/jobs").json()
+        for job in cards:
+            assert "description" not in job
+            assert "excerpt" in job and "bid_count" in job
+            assert len(job.get("images", [])) <= 3
+        
+        response = requests.get(f"{BASE_URL}/api/jobs?fields=title,location")
+        assert response.status_code == 200
+        for job in response.json():
+            assert set(job) <= {"id", "title", "location"}
+        
+        full = requests.get(f"{BASE_URL}/api/jobs?view=full").json()
+        for job in full:
+            assert "description" in job
+        
+        response = requests.get(f"{BASE_URL}/api/jobs?fields=title,password_hash")
+        assert response.status_code == 400
+        print("✓ Jobs field projection working")
 
 
 class TestBids:
@@ -450,6 +623,124 @@ class TestBids:
         data = response.json()
         assert isinstance(data, list)
         print(f"✓ Get my bids working - {len(data)} bids")
+    
+    def test_invoice_requires_payment_and_access(self, setup_job_and_users):
+        """Test invoice download is limited to job parties and needs a payment on file"""
+        url = f"{BASE_URL}/api/payments/{setup_job_and_users['job_id']}/invoice"
+        ho_headers = {"Authorization": f"Bearer {setup_job_and_users['ho_token']}"}
+        
+        response = requests.get(url, headers=ho_headers)
+        assert response.status_code == 404  # no escrow funded yet
+        
+        response = requests.get(url, headers=ho_headers, params={"kind": "receipt"})
+        assert response.status_code == 400
+        
+        response = requests.get(url, headers={"Authorization": f"Bearer {setup_job_and_users['co_token']}"})
+        assert response.status_code == 403
+        print("✓ Invoice access checks working")
+
+
+class TestUploads:
+    """Job photo upload tests"""
+    
+    # 1x1 transparent PNG
+    PNG_BYTES = bytes.fromhex(
+        "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+        "1f15c4890000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+    )
+    
+    @pytest.fixture
+    def homeowner_token(self):
+        email = f"test_upload_ho_{uuid.uuid4().hex[:8]}@test.com"
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": email,
+            "password": TEST_PASSWORD,
+            "full_name": "Upload Test Homeowner",
+            "user_type": "homeowner"
+        })
+        return response.json()["token"]
+    
+    def test_upload_is_content_addressed(self, homeowner_token):
+        """Test identical photos map to the same stored file"""
+        headers = {"Authorization": f"Bearer {homeowner_token}", "Content-Type": "image/png"}
+        first = requests.post(f"{BASE_URL}/api/uploads/images", headers=headers, data=self.PNG_BYTES)
+        assert first.status_code == 200
+        data = first.json()
+        assert data["url"].endswith(".png")
+        assert data["size"] == len(self.PNG_BYTES)
+        
+        second = requests.post(f"{BASE_URL}/api/uploads/images", headers=headers, data=self.PNG_BYTES)
+        assert second.json()["id"] == data["id"]
+        assert second.json()["deduplicated"] is True
+        print(f"✓ Upload stored once as {data['url']}")
+    
+    def test_upload_rejects_mismatched_type(self, homeowner_token):
+        """Test content that isn't the declared image type is refused"""
+        response = requests.post(f"{BASE_URL}/api/uploads/images",
+            headers={"Authorization": f"Bearer {homeowner_token}", "Content-Type": "image/jpeg"},
+            data=self.PNG_BYTES
+        )
+        assert response.status_code == 415
+        
+        response = requests.post(f"{BASE_URL}/api/uploads/images",
+            headers={"Authorization": f"Bearer {homeowner_token}", "Content-Type": "application/pdf"},
+            data=b"%PDF-1.4"
+        )
+        assert response.status_code == 415
+        print("✓ Upload type checks working")
+    
+    def test_job_images_expose_variants(self, homeowner_token):
+        """Test uploaded job photos gain thumbnails once background processing finishes"""
+        headers = {"Authorization": f"Bearer {homeowner_token}"}
+        upload = requests.post(f"{BASE_URL}/api/uploads/images",
+            headers={**headers, "Content-Type": "image/png"}, data=self.PNG_BYTES
+        ).json()
+        image_url = f"{BASE_URL}{upload['url']}"
+        job_id = requests.post(f"{BASE_URL}/api/jobs", headers=headers, json={
+            "title": "TEST_Photo Job",
+            "description": "Job with an uploaded photo",
+            "location": "Toronto",
+            "category": "Painting",
+            "budget_min": 1000,
+            "budget_max": 2000,
+            "images": [image_url]
+        }).json()["id"]
+        
+        for _ in range(20):
+            job = requests.get(f"{BASE_URL}/api/jobs/{job_id}").json()
+            if job["image_variants"][0]["w320"].endswith(".webp"):
+                break
+            time.sleep(0.5)
+        variants = job["image_variants"][0]
+        assert variants["original"] == image_url
+        assert variants["w320"].endswith(f"{upload['id']}_w320.webp")
+        assert variants["web"].endswith(f"{upload['id']}_web.webp")
+        
+        listed = requests.get(f"{BASE_URL}/api/jobs/my-jobs", headers=headers).json()
+        assert next(j for j in listed if j["id"] == job_id)["thumbnails"] == [variants["w320"]]
+        print("✓ Job image variants exposed")
+    
+    def test_uploaded_file_serving(self, homeowner_token):
+        """Test uploads are served with immutable caching, conditional requests and byte ranges"""
+        upload = requests.post(f"{BASE_URL}/api/uploads/images",
+            headers={"Authorization": f"Bearer {homeowner_token}", "Content-Type": "image/png"},
+            data=self.PNG_BYTES
+        ).json()
+        url = f"{BASE_URL}{upload['url']}"
+        
+        response = requests.get(url)
+        assert response.status_code == 200
+        assert response.content == self.PNG_BYTES
+        assert "immutable" in response.headers["Cache-Control"]
+        
+        response = requests.get(url, headers={"Range": "bytes=0-7"})
+        assert response.status_code == 206
+        assert response.content == self.PNG_BYTES[:8]
+        assert response.headers["Content-Range"] == f"bytes 0-7/{len(self.PNG_BYTES)}"
+        
+        response = requests.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
+        print("✓ Upload serving supports caching and ranges")
 
 
 class TestContractorProfile:
@@ -601,6 +892,54 @@ class TestAdminEndpoints:
         )
         assert response.status_code == 403
         print("✓ Non-admin correctly blocked from admin endpoints")
+    
+    def test_admin_db_stats(self, admin_token):
+        """Test per-route query statistics are reported"""
+        requests.get(f"{BASE_URL}/api/categories")
+        response = requests.get(f"{BASE_URL}/api/admin/db-stats",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "budget" in data
+        assert any(r["route"] == "GET /api/categories" for r in data["routes"])
+        print(f"✓ DB stats tracked for {len(data['routes'])} routes")
+    
+    def test_admin_db_stats_unmatched_paths_share_one_key(self, admin_token):
+        """Test unknown paths don't each get their own db-stats entry"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        before = requests.get(f"{BASE_URL}/api/admin/db-stats", headers=headers).json()["routes"]
+        paths = [f"/api/no-such-route-{uuid.uuid4().hex}" for _ in range(5)]
+        for path in paths:
+            assert requests.get(f"{BASE_URL}{path}").status_code == 404
+        
+        after = requests.get(f"{BASE_URL}/api/admin/db-stats", headers=headers).json()["routes"]
+        routes = {r["route"] for r in after}
+        assert not any(path in route for path in paths for route in routes)
+        assert len(after) - len(before) <= 1
+        assert "GET unmatched" in routes
+        print("✓ Unmatched paths share one db-stats key")
+    
+    def test_admin_export_streams_csv_and_ndjson(self, admin_token):
+        """Test admin exports stream CSV with a header row and NDJSON without password hashes"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = requests.get(f"{BASE_URL}/api/admin/export/jobs?format=csv", headers=headers, stream=True)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/csv")
+        assert "attachment" in response.headers["Content-Disposition"]
+        lines = response.text.splitlines()
+        assert lines[0].startswith("id,title,category")
+        
+        response = requests.get(f"{BASE_URL}/api/admin/export/users?format=ndjson&user_type=contractor", headers=headers)
+        assert response.status_code == 200
+        for line in response.text.splitlines():
+            row = json.loads(line)
+            assert row["user_type"] == "contractor"
+            assert "password_hash" not in row
+        
+        response = requests.get(f"{BASE_URL}/api/admin/export/secrets", headers=headers)
+        assert response.status_code == 404
+        print(f"✓ Admin export streamed {len(lines) - 1} jobs")
 
 
 class TestMessages:
@@ -675,6 +1014,67 @@ class TestMessages:
         assert response.status_code == 200
         assert isinstance(response.json(), list)
         print("✓ Get conversations working")
+    
+    def test_conversations_rate_limited_per_user(self, two_users):
+        """Test bursts beyond the per-user token bucket get 429 with Retry-After"""
+        statuses = []
+        for _ in range(15):
+            response = requests.get(f"{BASE_URL}/api/messages/conversations",
+                headers={"Authorization": f"Bearer {two_users['user2_token']}"}
+            )
+            statuses.append(response.status_code)
+        assert statuses[0] == 200
+        assert 429 in statuses
+        assert "Retry-After" in response.headers
+        print(f"✓ Conversations throttled after {statuses.index(429)} requests")
+    
+    def test_unread_count_reset_on_read(self, two_users):
+        """Test unread counter increments on send and resets when the conversation is opened"""
+        for content in ["First", "Second"]:
+            requests.post(f"{BASE_URL}/api/messages",
+                headers={"Authorization": f"Bearer {two_users['user1_token']}"},
+                json={"receiver_id": two_users["user2_id"], "content": content}
+            )
+        
+        response = requests.get(f"{BASE_URL}/api/messages/unread-count",
+            headers={"Authorization": f"Bearer {two_users['user2_token']}"}
+        )
+        assert response.status_code == 200
+        assert response.json()["unread_count"] == 2
+        
+        requests.get(f"{BASE_URL}/api/messages/{two_users['user1_id']}",
+            headers={"Authorization": f"Bearer {two_users['user2_token']}"}
+        )
+        response = requests.get(f"{BASE_URL}/api/messages/unread-count",
+            headers={"Authorization": f"Bearer {two_users['user2_token']}"}
+        )
+        assert response.json()["unread_count"] == 0
+        print("✓ Unread counter increments and resets")
+    
+    def test_conversation_pagination(self, two_users):
+        """Test conversation history is returned newest page first with a before= cursor"""
+        for i in range(3):
+            requests.post(f"{BASE_URL}/api/messages",
+                headers={"Authorization": f"Bearer {two_users['user1_token']}"},
+                json={"receiver_id": two_users["user2_id"], "content": f"Message {i}"}
+            )
+        
+        headers = {"Authorization": f"Bearer {two_users['user1_token']}"}
+        response = requests.get(f"{BASE_URL}/api/messages/{two_users['user2_id']}?limit=2", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert [m["content"] for m in data["messages"]] == ["Message 1", "Message 2"]
+        assert data["has_more"] is True
+        
+        response = requests.get(f"{BASE_URL}/api/messages/{two_users['user2_id']}",
+            headers=headers, params={"limit": 2, "before": data["next_before"], "before_id": data["next_before_id"]}
+        )
+        data = response.json()
+        assert [m["content"] for m in data["messages"]] == ["Message 0"]
+        assert data["has_more"] is False
+        assert data["next_before"] is None
+        assert data["next_before_id"] is None
+        print("✓ Conversation pagination working")
 
 
 if __name__ == "__main__":
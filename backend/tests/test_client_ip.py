@@ -0,0 +1,46 @@
+"""
+client_ip() tests on constructed request scopes: which address keys the per-IP limits
+"""
+import pytest
+from starlette.requests import Request
+
+server = pytest.importorskip("server")
+
+PEER = "10.0.0.7"  # the ingress, as seen on the socket
+
+
+def make_request(forwarded_for=None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/api/jobs", "headers": headers,
+                    "client": (PEER, 54321)})
+
+
+def test_proxy_appended_hop_is_the_client(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    assert server.client_ip(make_request("198.51.100.4")) == "198.51.100.4"
+
+
+def test_spoofed_hops_are_ignored(monkeypatch):
+    # A client can prepend anything; the ingress appends the address it actually saw
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    assert server.client_ip(make_request("1.2.3.4, 5.6.7.8, 198.51.100.4")) == "198.51.100.4"
+
+
+def test_two_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    assert server.client_ip(make_request("1.2.3.4, 198.51.100.4, 10.0.0.3")) == "198.51.100.4"
+
+
+def test_short_header_falls_back_to_leftmost_hop(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    assert server.client_ip(make_request("198.51.100.4")) == "198.51.100.4"
+
+
+def test_no_header_uses_socket_peer(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    assert server.client_ip(make_request()) == PEER
+
+
+def test_zero_hops_ignores_header(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+    assert server.client_ip(make_request("198.51.100.4")) == PEER
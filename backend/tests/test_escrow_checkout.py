@@ -0,0 +1,73 @@
+"""
+Escrow checkout reuse tests against the local fake Stripe, in a scratch MongoDB database
+"""
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fake_stripe import FakeStripeCheckout  # noqa: E402
+
+server = pytest.importorskip("server")
+
+TEST_DB_NAME = "buildlaunch_checkout_test"
+ORIGIN = "https://buildlaunch.test"
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/api/payments/escrow/create", "headers": [],
+                    "scheme": "http", "server": ("testserver", 80), "root_path": ""})
+
+
+def test_repeat_clicks_reuse_the_open_checkout(monkeypatch):
+    monkeypatch.setattr(server, "db", server.client[TEST_DB_NAME])
+    monkeypatch.setattr(server, "stripe_checkout_factory", FakeStripeCheckout)
+    monkeypatch.setattr(FakeStripeCheckout, "latency", 0)
+    
+    homeowner = {"id": str(uuid.uuid4()), "user_type": "homeowner"}
+    job_id = str(uuid.uuid4())
+    known_sessions = set(FakeStripeCheckout.sessions)
+    
+    async def fund(origin_url=ORIGIN):
+        payment_req = server.EscrowPaymentRequest(job_id=job_id, origin_url=origin_url)
+        return await server.create_escrow_payment(payment_req, make_request(), homeowner)
+    
+    async def run():
+        db = server.db
+        try:
+            await asyncio.wait_for(db.command("ping"), 2)
+        except Exception:
+            pytest.skip("MongoDB is not reachable")
+        await server.client.drop_database(TEST_DB_NAME)
+        try:
+            await db.jobs.insert_one({
+                "id": job_id, "homeowner_id": homeowner["id"], "title": "Checkout job",
+                "status": "open", "budget_max": 5000.0
+            })
+            first = await fund()
+            again = await fund()
+            other_origin = await fund("https://preview.buildlaunch.test")
+            await db.jobs.update_one({"id": job_id}, {"$set": {"budget_max": 6000.0}})
+            new_budget = await fund()
+            transactions = await db.payment_transactions.count_documents({"job_id": job_id})
+            charged = FakeStripeCheckout.sessions[new_budget["session_id"]].amount
+            return first, again, other_origin, new_budget, transactions, charged
+        finally:
+            await server.client.drop_database(TEST_DB_NAME)
+    
+    try:
+        first, again, other_origin, new_budget, transactions, charged = asyncio.run(run())
+    finally:
+        for session_id in set(FakeStripeCheckout.sessions) - known_sessions:
+            FakeStripeCheckout.sessions.pop(session_id, None)
+    
+    assert again == first  # same job, amount and origin: the stored URL, no Stripe call
+    assert other_origin["session_id"] != first["session_id"]
+    assert new_budget["session_id"] not in (first["session_id"], other_origin["session_id"])
+    assert charged == 6000.0
+    assert transactions == 3
+    print("✓ Repeat escrow clicks reused the open checkout session")
@@ -0,0 +1,130 @@
+"""
+Payment reconciler tests against the local fake Stripe, in a scratch MongoDB database
+"""
+import asyncio
+import sys
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fake_stripe import FakeStripeCheckout  # noqa: E402
+
+server = pytest.importorskip("server")
+
+TEST_DB_NAME = "buildlaunch_reconciler_test"
+
+
+def pending_transaction(session_id: str, job_id: str, minutes_ago: int) -> dict:
+    created = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "job_id": job_id,
+        "user_id": "reconciler-test-homeowner",
+        "amount": 5000.0,
+        "currency": "cad",
+        "payment_type": "escrow",
+        "payment_status": "pending",
+        "created_at": created.isoformat(),
+        "expires_at": created + server.CHECKOUT_SESSION_TTL
+    }
+
+
+def test_reconciler_settles_stale_checkouts(monkeypatch):
+    # The fake expires sessions it doesn't know, so never point it at a real database
+    monkeypatch.setattr(server, "db", server.client[TEST_DB_NAME])
+    monkeypatch.setattr(server, "stripe_checkout_factory", FakeStripeCheckout)
+    monkeypatch.setattr(FakeStripeCheckout, "latency", 0)
+    notified = []
+    
+    async def notify_payment_funded(job):
+        notified.append(job["id"])
+    
+    monkeypatch.setattr(server, "notify_payment_funded", notify_payment_funded)
+    
+    paid, still_open, abandoned, recent = (f"cs_test_{uuid.uuid4().hex}" for _ in range(4))
+    job_id = str(uuid.uuid4())
+    FakeStripeCheckout.sessions[paid] = SimpleNamespace(amount=5000.0, currency="cad", metadata={})
+    FakeStripeCheckout.open_sessions.add(still_open)
+    stale = server.RECONCILE_AFTER_MINUTES + 5
+    
+    async def run():
+        db = server.db
+        try:
+            await asyncio.wait_for(db.command("ping"), 2)
+        except Exception:
+            pytest.skip("MongoDB is not reachable")
+        await server.client.drop_database(TEST_DB_NAME)
+        try:
+            await db.jobs.insert_one({"id": job_id, "title": "Reconciler job", "status": "open", "escrow_amount": None})
+            await db.payment_transactions.insert_many([
+                pending_transaction(paid, job_id, stale),
+                pending_transaction(still_open, str(uuid.uuid4()), stale),
+                pending_transaction(abandoned, str(uuid.uuid4()), stale),
+                pending_transaction(recent, str(uuid.uuid4()), 1),
+            ])
+            
+            first = await server.reconcile_pending_payments()
+            second = await server.reconcile_pending_payments()
+            
+            statuses = {
+                t["session_id"]: t async for t in db.payment_transactions.find({}, {"_id": 0})
+            }
+            job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+            return first, second, statuses, job
+        finally:
+            await server.client.drop_database(TEST_DB_NAME)
+    
+    try:
+        first, second, transactions, job = asyncio.run(run())
+    finally:
+        FakeStripeCheckout.sessions.pop(paid, None)
+        FakeStripeCheckout.open_sessions.discard(still_open)
+    
+    assert first == {"paid": 1, "pending": 1, "expired": 1}
+    assert second == {"pending": 1}  # settled rows are not checked again
+    assert transactions[paid]["payment_status"] == "paid"
+    assert job["status"] == "in_escrow"
+    assert job["escrow_amount"] == 5000.0
+    assert notified == [job_id]  # once, by the run that settled it
+    assert transactions[still_open]["payment_status"] == "pending"
+    assert "reconciled_at" in transactions[still_open]
+    assert transactions[abandoned]["payment_status"] == "expired"
+    assert transactions[recent]["payment_status"] == "pending"
+    assert "reconciled_at" not in transactions[recent]
+    print("✓ Reconciler settled paid, expired and still-open checkouts")
+
+
+def test_only_one_worker_holds_the_reconciler_lease(monkeypatch):
+    monkeypatch.setattr(server, "db", server.client[TEST_DB_NAME])
+    
+    async def run():
+        db = server.db
+        try:
+            await asyncio.wait_for(db.command("ping"), 2)
+        except Exception:
+            pytest.skip("MongoDB is not reachable")
+        await server.client.drop_database(TEST_DB_NAME)
+        try:
+            await db.task_leases.create_index("name", unique=True)
+            first = await server.acquire_lease("payment_reconciler", 60)
+            renewed = await server.acquire_lease("payment_reconciler", 60)
+            monkeypatch.setattr(server, "WORKER_ID", "other-worker")
+            other = await server.acquire_lease("payment_reconciler", 60)
+            await db.task_leases.update_one({"name": "payment_reconciler"}, {"$set": {
+                "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+            }})
+            taken_over = await server.acquire_lease("payment_reconciler", 60)
+            return first, renewed, other, taken_over
+        finally:
+            await server.client.drop_database(TEST_DB_NAME)
+    
+    first, renewed, other, taken_over = asyncio.run(run())
+    assert (first, renewed) == (True, True)
+    assert other is False  # held by the first worker
+    assert taken_over is True  # the first worker's lease lapsed
+    print("✓ Reconciler lease held by one worker at a time")
@@ -0,0 +1,78 @@
+"""
+SMS dispatcher tests against the local fake Twilio API
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from twilio.rest import Client as TwilioClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fake_twilio import FakeTwilioServer  # noqa: E402
+
+server = pytest.importorskip("server")
+
+
+@pytest.fixture
+def fake_twilio():
+    with FakeTwilioServer() as fake:
+        yield fake
+
+
+def make_dispatcher(fake, rate_per_second=50):
+    client = TwilioClient("ACtest", "token")
+    client.api.base_url = fake.base_url
+    return server.SmsDispatcher(client, "+14165550000", rate_per_second, batch_size=5, max_retries=2,
+                                retry_backoff=0.01)
+
+
+def test_dispatcher_sends_queued_messages(fake_twilio):
+    async def run():
+        dispatcher = make_dispatcher(fake_twilio)
+        dispatcher.start()
+        for i in range(7):
+            dispatcher.enqueue(f"+1416555000{i}", f"Message {i}")
+        await dispatcher.stop()
+    
+    asyncio.run(run())
+    assert sorted(m["body"] for m in fake_twilio.messages) == [f"Message {i}" for i in range(7)]
+    print("✓ Dispatcher delivered every queued SMS")
+
+
+def test_dispatcher_retries_rate_limited_sends(fake_twilio):
+    fake_twilio.fail_next(2)
+    
+    async def run():
+        dispatcher = make_dispatcher(fake_twilio)
+        dispatcher.start()
+        dispatcher.enqueue("+14165550001", "Retry me")
+        await dispatcher.stop()
+    
+    asyncio.run(run())
+    assert [m["body"] for m in fake_twilio.messages] == ["Retry me"]
+    print("✓ Dispatcher retried after 429 responses")
+
+
+def test_dispatcher_paces_to_rate_limit(fake_twilio):
+    async def run():
+        dispatcher = make_dispatcher(fake_twilio, rate_per_second=20)
+        dispatcher.start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(5):
+            dispatcher.enqueue("+14165550002", f"Paced {i}")
+        await dispatcher.stop()
+        return loop.time() - started
+    
+    elapsed = asyncio.run(run())
+    assert len(fake_twilio.messages) == 5
+    assert elapsed >= 4 / 20
+    print(f"✓ Five SMS at 20/s took {elapsed:.2f}s")
+
+
+def test_normalize_phone():
+    assert server.normalize_phone("416-555-1234") == "+14165551234"
+    assert server.normalize_phone("1 (416) 555-1234") == "+14165551234"
+    assert server.normalize_phone("+44 20 7946 0958") == "+442079460958"
+    assert server.normalize_phone("555-1234") is None
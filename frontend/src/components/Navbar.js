@@ -1,6 +1,7 @@
 import React from 'react';
 import { Link, useNavigate } from 'react-router-dom';
-import { useAuth } from '../App';
+import axios from 'axios';
+import { useAuth, API } from '../App';
 import Logo from './Logo';
 import { Button } from '../components/ui/button';
 import {
@@ -13,9 +14,19 @@ import {
 import { Menu, X, User, LogOut, MessageSquare, Settings, LayoutDashboard, Phone } from 'lucide-react';
 
 const Navbar = () => {
-  const { user, logout } = useAuth();
+  const { user, token, logout } = useAuth();
   const navigate = useNavigate();
   const [mobileMenuOpen, setMobileMenuOpen] = React.useState(false);
+  const [unreadCount, setUnreadCount] = React.useState(0);
+
+  React.useEffect(() => {
+    if (!user || !token) return;
+    axios.get(`${API}/messages/unread-count`, {
+      headers: { Authorization: `Bearer ${token}` }
+    })
+      .then((res) => setUnreadCount(res.data.unread_count))
+      .catch(() => setUnreadCount(0));
+  }, [user, token]);
 
   const handleLogout = () => {
     logout();
@@ -58,7 +69,9 @@ const Navbar = () => {
               <div className="flex items-center gap-4">
                 <Link to="/messages" className="relative text-muted-foreground hover:text-white transition-colors p-2 rounded-lg hover:bg-white/5">
                   <MessageSquare className="w-5 h-5" />
-                  <span className="absolute -top-1 -right-1 w-2 h-2 bg-cyan-400 rounded-full animate-pulse" />
+                  {unreadCount > 0 && (
+                    <span className="absolute -top-1 -right-1 w-2 h-2 bg-cyan-400 rounded-full animate-pulse" data-testid="unread-badge" />
+                  )}
                 </Link>
                 
                 <DropdownMenu>
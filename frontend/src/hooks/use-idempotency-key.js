@@ -0,0 +1,23 @@
+import { useRef } from 'react';
+
+// One Idempotency-Key per submission. The key is kept while the request is retried
+// after a network failure, so the server runs it at most once. It is replaced once
+// the server has answered, so the next (possibly edited) submission is a new request.
+export function useIdempotencyKey() {
+  const keyRef = useRef(null);
+
+  const headers = () => {
+    if (!keyRef.current) {
+      keyRef.current = crypto.randomUUID();
+    }
+    return { 'Idempotency-Key': keyRef.current };
+  };
+
+  const settle = (error) => {
+    if (!error || error.response) {
+      keyRef.current = null;
+    }
+  };
+
+  return { headers, settle };
+}
@@ -11,7 +11,7 @@ import { toast } from 'sonner';
 import { 
   Users, Briefcase, DollarSign, Shield, CheckCircle, 
   XCircle, Eye, UserCheck, UserX, Trash2, AlertTriangle,
-  TrendingUp, Clock, MapPin
+  TrendingUp, Clock, MapPin, Download
 } from 'lucide-react';
 
 const AdminDashboard = () => {
@@ -88,6 +88,36 @@ const AdminDashboard = () => {
     }
   };
 
+  const handleExport = async (dataset) => {
+    try {
+      const response = await axios.get(`${API}/admin/export/${dataset}?format=csv`, {
+        headers: { Authorization: `Bearer ${token}` },
+        responseType: 'blob'
+      });
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `buildlaunch-${dataset}.csv`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error('Failed to export data');
+    }
+  };
+
+  const ExportButton = ({ dataset, label }) => (
+    <Button
+      variant="outline"
+      size="sm"
+      className="border-white/10"
+      onClick={() => handleExport(dataset)}
+      data-testid={`admin-export-${dataset}`}
+    >
+      <Download className="w-4 h-4 mr-2" />
+      {label}
+    </Button>
+  );
+
   if (loading) {
     return (
       <div className="min-h-screen bg-background flex items-center justify-center">
@@ -206,9 +236,12 @@ const AdminDashboard = () => {
           {/* Users Tab */}
           <TabsContent value="users">
             <Card className="bg-card border-white/10">
-              <CardHeader>
-                <CardTitle>User Management</CardTitle>
-                <CardDescription>Manage homeowners and contractors</CardDescription>
+              <CardHeader className="flex flex-row items-start justify-between">
+                <div>
+                  <CardTitle>User Management</CardTitle>
+                  <CardDescription>Manage homeowners and contractors</CardDescription>
+                </div>
+                <ExportButton dataset="users" label="Export CSV" />
               </CardHeader>
               <CardContent>
                 <div className="space-y-3">
@@ -277,9 +310,12 @@ const AdminDashboard = () => {
           {/* Jobs Tab */}
           <TabsContent value="jobs">
             <Card className="bg-card border-white/10">
-              <CardHeader>
-                <CardTitle>Job Management</CardTitle>
-                <CardDescription>Monitor and manage all jobs on the platform</CardDescription>
+              <CardHeader className="flex flex-row items-start justify-between">
+                <div>
+                  <CardTitle>Job Management</CardTitle>
+                  <CardDescription>Monitor and manage all jobs on the platform</CardDescription>
+                </div>
+                <ExportButton dataset="jobs" label="Export CSV" />
               </CardHeader>
               <CardContent>
                 <div className="space-y-3">
@@ -346,9 +382,15 @@ const AdminDashboard = () => {
           {/* Payments Tab */}
           <TabsContent value="payments">
             <Card className="bg-card border-white/10">
-              <CardHeader>
-                <CardTitle>Payment History</CardTitle>
-                <CardDescription>All escrow transactions and payouts</CardDescription>
+              <CardHeader className="flex flex-row items-start justify-between">
+                <div>
+                  <CardTitle>Payment History</CardTitle>
+                  <CardDescription>All escrow transactions and payouts</CardDescription>
+                </div>
+                <div className="flex gap-2">
+                  <ExportButton dataset="payments" label="Transactions CSV" />
+                  <ExportButton dataset="payouts" label="Payouts CSV" />
+                </div>
               </CardHeader>
               <CardContent>
                 <div className="space-y-6">
@@ -85,7 +85,7 @@ const BrowseJobs = () => {
       const searchLower = filters.search.toLowerCase();
       result = result.filter(job => 
         job.title.toLowerCase().includes(searchLower) ||
-        job.description.toLowerCase().includes(searchLower) ||
+        job.excerpt.toLowerCase().includes(searchLower) ||
         job.category.toLowerCase().includes(searchLower)
       );
     }
@@ -344,7 +344,7 @@ const BrowseJobs = () => {
                         )}
                       </div>
                       <p className="text-muted-foreground text-sm mb-3 line-clamp-2">
-                        {job.description}
+                        {job.excerpt}
                       </p>
                       <div className="flex flex-wrap items-center gap-4 text-sm">
                         <span className="flex items-center gap-1 text-muted-foreground">
@@ -368,14 +368,14 @@ const BrowseJobs = () => {
                     <div className="flex items-center gap-3">
                       {job.images && job.images.length > 0 && (
                         <div className="hidden sm:flex -space-x-2">
-                          {job.images.slice(0, 3).map((img, i) => (
+                          {(job.thumbnails || job.images).slice(0, 3).map((img, i) => (
                             <div key={i} className="w-10 h-10 rounded-lg border-2 border-card overflow-hidden">
                               <img src={img} alt="" className="w-full h-full object-cover" />
                             </div>
                           ))}
-                          {job.images.length > 3 && (
+                          {job.image_count > 3 && (
                             <div className="w-10 h-10 rounded-lg border-2 border-card bg-white/10 flex items-center justify-center text-xs text-white">
-                              +{job.images.length - 3}
+                              +{job.image_count - 3}
                             </div>
                           )}
                         </div>
@@ -27,20 +27,12 @@ const ContractorDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [jobsRes, bidsRes, statsRes] = await Promise.all([
-        axios.get(`${API}/jobs`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${API}/bids/my-bids`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${API}/stats/dashboard`, {
-          headers: { Authorization: `Bearer ${token}` }
-        })
-      ]);
-      setJobs(jobsRes.data);
-      setBids(bidsRes.data);
-      setStats(statsRes.data);
+      const response = await axios.get(`${API}/dashboard`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setJobs(response.data.jobs);
+      setBids(response.data.bids);
+      setStats(response.data.stats);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
@@ -213,7 +205,7 @@ const ContractorDashboard = () => {
                             )}
                           </div>
                           <p className="text-muted-foreground text-sm mb-3 line-clamp-2">
-                            {job.description}
+                            {job.excerpt}
                           </p>
                           <div className="flex flex-wrap items-center gap-4 text-sm text-muted-foreground">
                             <span className="flex items-center gap-1">
@@ -26,16 +26,11 @@ const HomeownerDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [jobsRes, statsRes] = await Promise.all([
-        axios.get(`${API}/jobs/my-jobs`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${API}/stats/dashboard`, {
-          headers: { Authorization: `Bearer ${token}` }
-        })
-      ]);
-      setJobs(jobsRes.data);
-      setStats(statsRes.data);
+      const response = await axios.get(`${API}/dashboard`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setJobs(response.data.jobs);
+      setStats(response.data.stats);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import axios from 'axios';
 import { useAuth, API } from '../App';
+import { useIdempotencyKey } from '../hooks/use-idempotency-key';
 import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import { Button } from '../components/ui/button';
@@ -22,6 +23,8 @@ const JobDetails = () => {
   const { jobId } = useParams();
   const { user, token } = useAuth();
   const navigate = useNavigate();
+  const bidSubmission = useIdempotencyKey();
+  const escrowSubmission = useIdempotencyKey();
   const [job, setJob] = useState(null);
   const [bids, setBids] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -42,18 +45,28 @@ const JobDetails = () => {
 
   const fetchJobDetails = async () => {
     try {
-      const jobRes = await axios.get(`${API}/jobs/${jobId}`);
-      setJob(jobRes.data);
-
       if (user && token) {
-        try {
-          const bidsRes = await axios.get(`${API}/jobs/${jobId}/bids`, {
-            headers: { Authorization: `Bearer ${token}` }
-          });
-          setBids(bidsRes.data);
-        } catch (err) {
-          // User might not have access to bids
+        // Job and bids in one round trip; each part carries its own status
+        const batchRes = await axios.post(`${API}/batch`, {
+          requests: [
+            { id: 'job', path: `/api/jobs/${jobId}` },
+            { id: 'bids', path: `/api/jobs/${jobId}/bids` }
+          ]
+        }, {
+          headers: { Authorization: `Bearer ${token}` }
+        });
+        const [jobPart, bidsPart] = batchRes.data.responses;
+        if (jobPart.status !== 200) {
+          throw new Error(jobPart.body?.detail || 'Job not found');
+        }
+        setJob(jobPart.body);
+        if (bidsPart.status === 200) {
+          setBids(bidsPart.body);
         }
+        // Otherwise the user might not have access to bids
+      } else {
+        const jobRes = await axios.get(`${API}/jobs/${jobId}`);
+        setJob(jobRes.data);
       }
     } catch (error) {
       toast.error('Job not found');
@@ -73,14 +86,16 @@ const JobDetails = () => {
         message: bidForm.message,
         estimated_days: parseInt(bidForm.estimated_days),
       }, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}`, ...bidSubmission.headers() }
       });
+      bidSubmission.settle();
 
       toast.success('Bid submitted successfully!');
       setBidDialogOpen(false);
       setBidForm({ amount: '', message: '', estimated_days: '' });
       fetchJobDetails();
     } catch (error) {
+      bidSubmission.settle(error);
       toast.error(error.response?.data?.detail || 'Failed to submit bid');
     } finally {
       setSubmittingBid(false);
@@ -94,11 +109,13 @@ const JobDetails = () => {
         job_id: jobId,
         origin_url: window.location.origin
       }, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}`, ...escrowSubmission.headers() }
       });
+      escrowSubmission.settle();
 
       window.location.href = response.data.checkout_url;
     } catch (error) {
+      escrowSubmission.settle(error);
       toast.error(error.response?.data?.detail || 'Failed to create payment');
       setProcessingPayment(false);
     }
@@ -217,7 +234,7 @@ const JobDetails = () => {
                               data-testid={`job-image-${index}`}
                             >
                               <img 
-                                src={img}
+                                src={job.image_variants?.[index]?.w640 || img}
                                 alt={`Project ${index + 1}`}
                                 className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"
                               />
@@ -226,7 +243,7 @@ const JobDetails = () => {
                           <DialogContent className="max-w-3xl bg-card border-white/10 p-2">
                             <div className="relative">
                               <img 
-                                src={img.replace('w=400', 'w=1200')}
+                                src={job.image_variants?.[index]?.web || img.replace('w=400', 'w=1200')}
                                 alt={`Project ${index + 1}`}
                                 className="w-full rounded-lg"
                               />
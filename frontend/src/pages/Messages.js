@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useParams } from 'react-router-dom';
 import axios from 'axios';
 import { useAuth, API } from '../App';
+import { useIdempotencyKey } from '../hooks/use-idempotency-key';
 import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import { Button } from '../components/ui/button';
@@ -21,7 +22,11 @@ const Messages = () => {
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
+  const messageSubmission = useIdempotencyKey();
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  const skipScrollRef = useRef(false);
 
   useEffect(() => {
     fetchConversations();
@@ -34,6 +39,10 @@ const Messages = () => {
   }, [activeConversation]);
 
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -61,12 +70,36 @@ const Messages = () => {
       const response = await axios.get(`${API}/messages/${otherUserId}`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setMessages(response.data);
+      setMessages(response.data.messages);
+      setOlderCursor(response.data.has_more
+        ? { before: response.data.next_before, before_id: response.data.next_before_id }
+        : null);
     } catch (error) {
       console.error('Failed to load messages');
     }
   };
 
+  const fetchOlderMessages = async () => {
+    if (!olderCursor || !activeConversation) return;
+
+    setLoadingOlder(true);
+    try {
+      const response = await axios.get(`${API}/messages/${activeConversation}`, {
+        params: olderCursor,
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      skipScrollRef.current = true;
+      setMessages((prev) => [...response.data.messages, ...prev]);
+      setOlderCursor(response.data.has_more
+        ? { before: response.data.next_before, before_id: response.data.next_before_id }
+        : null);
+    } catch (error) {
+      toast.error('Failed to load older messages');
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const sendMessage = async (e) => {
     e.preventDefault();
     if (!newMessage.trim() || !activeConversation) return;
@@ -77,13 +110,15 @@ const Messages = () => {
         receiver_id: activeConversation,
         content: newMessage.trim()
       }, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}`, ...messageSubmission.headers() }
       });
+      messageSubmission.settle();
 
       setNewMessage('');
       fetchMessages(activeConversation);
       fetchConversations();
     } catch (error) {
+      messageSubmission.settle(error);
       toast.error('Failed to send message');
     } finally {
       setSending(false);
@@ -210,6 +245,19 @@ const Messages = () => {
                 {/* Messages */}
                 <ScrollArea className="flex-1 p-4">
                   <div className="space-y-4">
+                    {olderCursor && (
+                      <div className="text-center">
+                        <Button
+                          variant="ghost"
+                          size="sm"
+                          onClick={fetchOlderMessages}
+                          disabled={loadingOlder}
+                          data-testid="load-older-messages"
+                        >
+                          {loadingOlder ? 'Loading...' : 'Load older messages'}
+                        </Button>
+                      </div>
+                    )}
                     {messages.map((msg, index) => {
                       const isOwn = msg.sender_id === user?.id;
                       const showDate = index === 0 || 
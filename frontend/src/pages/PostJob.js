@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { useAuth, API } from '../App';
+import { useIdempotencyKey } from '../hooks/use-idempotency-key';
 import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import { Button } from '../components/ui/button';
@@ -16,6 +17,7 @@ import { ArrowRight, MapPin, DollarSign, Calendar, ImagePlus, X, Upload } from '
 const PostJob = () => {
   const { token } = useAuth();
   const navigate = useNavigate();
+  const submission = useIdempotencyKey();
   const [loading, setLoading] = useState(false);
   const [categories, setCategories] = useState([]);
   const [locations, setLocations] = useState([]);
@@ -30,13 +32,8 @@ const PostJob = () => {
     images: [],
   });
 
-  // Sample placeholder images for demo
-  const sampleImages = [
-    'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400&q=80',
-    'https://images.unsplash.com/photo-1552321554-5fefe8c9ef14?w=400&q=80',
-    'https://images.unsplash.com/photo-1560448204-e02f11c3d0e2?w=400&q=80',
-    'https://images.unsplash.com/photo-1600585154340-be6161a56a0c?w=400&q=80',
-  ];
+  const [uploading, setUploading] = useState(false);
+  const fileInputRef = useRef(null);
 
   useEffect(() => {
     fetchOptions();
@@ -55,15 +52,27 @@ const PostJob = () => {
     }
   };
 
-  const handleAddSampleImage = () => {
-    if (formData.images.length < 6) {
-      const availableImages = sampleImages.filter(img => !formData.images.includes(img));
-      if (availableImages.length > 0) {
-        const randomImage = availableImages[Math.floor(Math.random() * availableImages.length)];
-        setFormData({ ...formData, images: [...formData.images, randomImage] });
-      }
-    } else {
+  const handleImageSelected = async (e) => {
+    const file = e.target.files?.[0];
+    e.target.value = '';
+    if (!file) return;
+    if (formData.images.length >= 6) {
       toast.error('Maximum 6 images allowed');
+      return;
+    }
+
+    setUploading(true);
+    try {
+      // Raw body upload so the server can stream it straight to disk
+      const response = await axios.post(`${API}/uploads/images`, file, {
+        headers: { Authorization: `Bearer ${token}`, 'Content-Type': file.type }
+      });
+      const url = `${process.env.REACT_APP_BACKEND_URL}${response.data.url}`;
+      setFormData((prev) => prev.images.includes(url) ? prev : { ...prev, images: [...prev.images, url] });
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to upload photo');
+    } finally {
+      setUploading(false);
     }
   };
 
@@ -93,12 +102,14 @@ const PostJob = () => {
         budget_min: parseFloat(formData.budget_min),
         budget_max: parseFloat(formData.budget_max),
       }, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}`, ...submission.headers() }
       });
+      submission.settle();
       
       toast.success('Job posted successfully!');
       navigate(`/jobs/${response.data.id}`);
     } catch (error) {
+      submission.settle(error);
       toast.error(error.response?.data?.detail || 'Failed to post job');
     } finally {
       setLoading(false);
@@ -176,18 +187,27 @@ const PostJob = () => {
                   </div>
                 )}
                 
+                <input
+                  ref={fileInputRef}
+                  type="file"
+                  accept="image/jpeg,image/png,image/webp"
+                  onChange={handleImageSelected}
+                  className="hidden"
+                  data-testid="image-file-input"
+                />
                 {formData.images.length < 6 && (
                   <Button
                     type="button"
                     variant="outline"
-                    onClick={handleAddSampleImage}
+                    onClick={() => fileInputRef.current?.click()}
+                    disabled={uploading}
                     className="w-full border-dashed border-2 h-20 hover:bg-accent/50"
                     data-testid="add-image-btn"
                   >
                     <div className="flex flex-col items-center gap-1">
                       <ImagePlus className="w-6 h-6 text-muted-foreground" />
                       <span className="text-sm text-muted-foreground">
-                        Add Photo ({formData.images.length}/6)
+                        {uploading ? 'Uploading...' : `Add Photo (${formData.images.length}/6)`}
                       </span>
                     </div>
                   </Button>
@@ -10,10 +10,11 @@ import { Textarea } from '../components/ui/textarea';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { Separator } from '../components/ui/separator';
+import { Switch } from '../components/ui/switch';
 import { toast } from 'sonner';
 import { 
   User, Shield, CheckCircle, AlertCircle, 
-  Save, FileText, Building2 
+  Save, FileText, Building2, Bell 
 } from 'lucide-react';
 
 const Profile = () => {
@@ -30,6 +31,9 @@ const Profile = () => {
     years_experience: '',
     specialties: '',
   });
+  const [digestEnabled, setDigestEnabled] = useState(
+    user?.notification_preferences?.email_frequency === 'digest'
+  );
 
   useEffect(() => {
     if (user?.verification) {
@@ -60,6 +64,22 @@ const Profile = () => {
     }
   };
 
+  const handleDigestToggle = async (enabled) => {
+    setDigestEnabled(enabled);
+    try {
+      const response = await axios.put(`${API}/auth/notification-preferences`, {
+        email_frequency: enabled ? 'digest' : 'immediate'
+      }, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      updateUser({ notification_preferences: response.data.notification_preferences });
+      toast.success(enabled ? 'Bid emails will arrive as a digest' : 'Bid emails will arrive as they happen');
+    } catch (error) {
+      setDigestEnabled(!enabled);
+      toast.error('Failed to update notification preferences');
+    }
+  };
+
   const handleVerificationUpdate = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -144,6 +164,32 @@ const Profile = () => {
           </CardContent>
         </Card>
 
+        {/* Notification Preferences */}
+        {user?.user_type === 'homeowner' && (
+          <Card className="bg-card border-white/10 mb-6">
+            <CardHeader>
+              <div className="flex items-center gap-3">
+                <Bell className="w-5 h-5 text-primary" />
+                <div>
+                  <CardTitle className="font-heading">Email Notifications</CardTitle>
+                  <CardDescription>Get one summary email instead of an email for every new bid</CardDescription>
+                </div>
+              </div>
+            </CardHeader>
+            <CardContent>
+              <div className="flex items-center justify-between">
+                <Label htmlFor="digest-toggle">Send new bids as a digest</Label>
+                <Switch
+                  id="digest-toggle"
+                  checked={digestEnabled}
+                  onCheckedChange={handleDigestToggle}
+                  data-testid="digest-toggle"
+                />
+              </div>
+            </CardContent>
+          </Card>
+        )}
+
         {/* Contractor Verification */}
         {user?.user_type === 'contractor' && (
           <Card className="bg-card border-white/10">